@@ -1,24 +1,71 @@
 # -*- coding: utf-8 -*-
 import json
+import sys
 import threading
 import time
 import os
+import queue
 import random
 import re
-import requests
-import google.generativeai as genai
-from dotenv import load_dotenv
+import heapq
+import itertools
+import hashlib
+import uuid
+import bisect
+import sqlite3
+import atexit
+import zlib
+import base64
+import multiprocessing
+import mmap
+import struct
+import copy
+import importlib
+from collections import deque, OrderedDict
 from datetime import datetime
-from rich.console import Console
-from rich.panel import Panel
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from logging.handlers import RotatingFileHandler
 
+# --- Startup Profile ---
+PROCESS_START = time.perf_counter()
+PROCESS_START_WALL = time.time()
+startup_metrics = {
+    'cold_start_seconds': None, 'panel_ready_seconds': None, 'first_request_seconds': None,
+    'handlers_running_seconds': None, 'imports_ms': {}, 'progress': None
+}
+
+def profiled_import(name: str):
+    """Import modul sambil mencatat lamanya di profil startup; modul yang sudah dimuat langsung dikembalikan."""
+    module = sys.modules.get(name)
+    if module is not None: return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    startup_metrics['imports_ms'][name] = round((time.perf_counter() - start) * 1000, 1)
+    return module
+
+# SDK Gemini dan rich dimuat saat pertama dipakai (lihat GoogleGeminiBackend dan get_console)
+requests = profiled_import('requests')
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+profiled_import('dotenv')
+from dotenv import load_dotenv
+profiled_import('flask')
+from flask import Flask, render_template, request, jsonify, Response
+profiled_import('flask_socketio')
+from flask_socketio import SocketIO, emit
+
 # --- Inisialisasi Awal ---
 load_dotenv()
-console = Console()
+_console = None
+
+def get_console():
+    """Console rich dibuat saat log pertama dirender, bukan saat import."""
+    global _console
+    if _console is None:
+        _console = profiled_import('rich.console').Console()
+    return _console
 
 # Flask App Setup
 app = Flask(__name__)
@@ -29,8 +76,16 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 global_config = {}
 bot_accounts = {}
 channel_handlers = {}
-system_logs = []
+supervisor = None
+current_shard = None
 MAX_LOGS = 1000
+system_logs = deque(maxlen=MAX_LOGS)
+DISCORD_API_BASE = os.getenv('DISCORD_API_BASE', 'https://discord.com/api/v9').rstrip('/')
+DEFAULT_HTTP_SETTINGS = {
+    "pool_maxsize": 10, "connect_timeout": 5, "read_timeout": 15,
+    "max_retries": 2, "backoff_factor": 0.5,
+    "max_rate_limit_retries": 3, "max_rate_limit_wait": 30
+}
 
 # --- Logging Setup ---
 def setup_logging():
@@ -42,9 +97,578 @@ def setup_logging():
     ))
     app.logger.addHandler(handler)
 
+# --- Instrumentation ---
+class _NullSpan:
+    """Span kosong yang dipakai bersama saat tracing nonaktif."""
+    __slots__ = ()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'started')
+
+    def __init__(self, tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.tracer._stack().append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stack = self.tracer._stack()
+        self.tracer._record(tuple(stack), elapsed)
+        stack.pop()
+        return False
+
+class SpanTracer:
+    """Timing span per handler dan per fase hot path, opt-in dari panel.
+
+    Saat nonaktif, span() hanya memeriksa satu boolean dan mengembalikan NULL_SPAN.
+    Saat aktif, span bersarang per thread membentuk jalur seperti
+    "poll alice:123;fetch" yang diagregasi (jumlah, total, maks) dan bisa diekspor
+    sebagai folded stacks untuk flamegraph dengan nilai mikrodetik self-time.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.enabled_at = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    def span(self, name: str, label: str | None = None):
+        if not self.enabled: return NULL_SPAN
+        return _Span(self, f"{name} {label}" if label else name)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, path: tuple, elapsed: float):
+        with self._lock:
+            stat = self._stats.get(path)
+            if stat is None:
+                self._stats[path] = [1, elapsed, elapsed]
+                return
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]: stat[2] = elapsed
+
+    def set_enabled(self, enabled: bool):
+        if enabled and not self.enabled:
+            self.enabled_at = time.time()
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self, limit: int = 50) -> list:
+        with self._lock:
+            items = [(path, list(stat)) for path, stat in self._stats.items()]
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [{
+            'path': ';'.join(path), 'count': count, 'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / count, 3), 'max_ms': round(peak * 1000, 3)
+        } for path, (count, total, peak) in items[:limit]]
+
+    def folded(self) -> str:
+        """Folded stacks (format flamegraph.pl/speedscope); nilai = mikrodetik self-time tiap jalur."""
+        with self._lock:
+            totals = {path: stat[1] for path, stat in self._stats.items()}
+        self_time = dict(totals)
+        for path, total in totals.items():
+            if len(path) > 1 and path[:-1] in self_time:
+                self_time[path[:-1]] -= total
+        lines = [f"{';'.join(path)} {int(value * 1e6)}" for path, value in sorted(self_time.items()) if value > 0]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            paths = len(self._stats)
+        return {'enabled': self.enabled, 'enabled_at': self.enabled_at, 'paths': paths}
+
+THREAD_NAME_DIGITS = re.compile(r'\d+')
+
+class SamplingProfiler:
+    """Profiler sampling untuk semua thread, hanya berjalan saat diminta dari panel.
+
+    Satu thread sampler membaca sys._current_frames() setiap `interval` detik dan
+    menghitung stack yang identik. Tidak memasang hook trace/profile, jadi thread lain
+    hanya terganggu selama sampler memegang GIL. Berhenti otomatis setelah `duration` detik.
+    """
+    MAX_DURATION = 300.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self.interval = 0.01
+        self.duration = 0.0
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float = 30.0, interval: float = 0.01) -> bool:
+        with self._lock:
+            if self.running: return False
+            self._counts = {}
+            self.samples = 0
+            self.duration = min(max(duration, 1.0), self.MAX_DURATION)
+            self.interval = min(max(interval, 0.001), 1.0)
+            self.started_at, self.stopped_at = time.time(), None
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(1.0)
+
+    def _run(self, stop: threading.Event):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        labels = {}
+        while not stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {t.ident: THREAD_NAME_DIGITS.sub('N', t.name) for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own_ident: continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                        stack.append(label)
+                        frame = frame.f_back
+                    stack.append(names.get(ident, 'unknown'))
+                    key = ';'.join(reversed(stack))
+                    self._counts[key] = self._counts.get(key, 0) + 1
+                self.samples += 1
+            del frames
+        self.stopped_at = time.time()
+
+    def folded(self) -> str:
+        """Folded stacks (format flamegraph.pl/speedscope); nilai = jumlah sampel."""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in sorted(self._counts.items())]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stacks = len(self._counts)
+        return {
+            'running': self.running, 'samples': self.samples, 'stacks': stacks,
+            'interval': self.interval, 'duration': self.duration,
+            'started_at': self.started_at, 'stopped_at': self.stopped_at
+        }
+
+tracer = SpanTracer()
+profiler = SamplingProfiler()
+
+# --- Log Pipeline ---
+class LogPipeline:
+    """Pipeline log non-blocking.
+
+    log_message hanya menyimpan entri ke buffer memori dan memasukkannya ke antrean;
+    satu thread writer di belakang menangani render konsol (rich), Socket.IO, dan file log.
+    Jika antrean penuh, entri dibuang dan dihitung alih-alih memperlambat pemanggil.
+    """
+    def __init__(self, maxsize: int = 10000, console_enabled: bool = True):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.console_enabled = console_enabled
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+        self.evicted = 0
+        self.written = 0
+        self.max_depth = 0
+        # Di proses shard, entri diteruskan ke panel alih-alih ditulis di sini
+        self.forward = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._writer_loop, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, log_entry: dict):
+        if len(system_logs) == system_logs.maxlen:
+            self.evicted += 1
+        system_logs.append(log_entry)
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(log_entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def flush(self, timeout: float = 5.0):
+        """Menunggu sampai antrean kosong (dipakai saat shutdown/benchmark)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _writer_loop(self):
+        while True:
+            log_entry = self._queue.get()
+            try:
+                if self.forward:
+                    self.forward(log_entry)
+                else:
+                    with tracer.span('log_writer'):
+                        self._write(log_entry)
+                        with tracer.span('history'):
+                            log_history.append(log_entry)
+                self.written += 1
+            except Exception:
+                app.logger.exception("Log pipeline gagal menulis entri")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, log_entry: dict):
+        title, message, level, color = log_entry['title'], log_entry['message'], log_entry['level'], log_entry['color']
+        if self.console_enabled:
+            with tracer.span('console'):
+                Panel = profiled_import('rich.panel').Panel
+                get_console().print(
+                    Panel(
+                        f"[b]{log_entry['timestamp']}[/b]\n\n{message}",
+                        title=f"[{color}]{title}[/{color}]",
+                        expand=False,
+                        border_style=color
+                    )
+                )
+        
+        with tracer.span('broadcast'):
+            log_broadcaster.publish(log_entry)
+        
+        if level == "ERROR":
+            app.logger.error(f"{title}: {message}")
+        elif level == "WARNING":
+            app.logger.warning(f"{title}: {message}")
+        else:
+            app.logger.info(f"{title}: {message}")
+
+    def get_stats(self) -> dict:
+        return {
+            'queue_depth': self._queue.qsize(), 'max_depth': self.max_depth,
+            'dropped': self.dropped, 'evicted': self.evicted, 'written': self.written,
+            'console_enabled': self.console_enabled
+        }
+
+class LogBroadcaster:
+    """Mengirim log ke klien web dalam frame batch per jendela waktu.
+
+    Entri identik yang berurutan digabung menjadi satu dengan `count`; entri WAIT dengan
+    judul sama (mis. "Rate Limited") digabung walau lama tunggunya berbeda. Tiap klien
+    punya antrean sendiri: frame berikutnya baru dikirim setelah klien meng-ack frame
+    sebelumnya, dan bila antrean klien penuh entri terlama dibuang dan dilaporkan.
+    """
+    def __init__(self, interval: float = 0.2, max_pending: int = 500, ack_timeout: float = 10.0):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.ack_timeout = ack_timeout
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._clients = {}
+        self._thread = None
+        self.frames_sent = 0
+        self.entries_coalesced = 0
+
+    def add_client(self, sid: str):
+        with self._lock:
+            self._clients[sid] = {'pending': [], 'dropped': 0, 'in_flight_since': None}
+
+    def remove_client(self, sid: str):
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    @staticmethod
+    def _coalesce_key(log_entry: dict) -> tuple:
+        if log_entry['level'] == "WAIT":
+            return log_entry['level'], log_entry['title']
+        return log_entry['level'], log_entry['title'], log_entry['message']
+
+    def publish(self, log_entry: dict):
+        with self._lock:
+            if not self._clients: return
+            key = self._coalesce_key(log_entry)
+            for state in self._clients.values():
+                pending = state['pending']
+                if pending and self._coalesce_key(pending[-1]) == key:
+                    previous = pending[-1]
+                    pending[-1] = {
+                        **log_entry, 'count': previous.get('count', 1) + 1,
+                        'first_timestamp': previous.get('first_timestamp', previous['timestamp'])
+                    }
+                    self.entries_coalesced += 1
+                    continue
+                pending.append(log_entry)
+                if len(pending) > self.max_pending:
+                    del pending[0]
+                    state['dropped'] += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._flush_loop, name="log-broadcaster", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            self._wakeup.clear()
+            if self._flush():
+                self._wakeup.set()
+
+    def _flush(self) -> bool:
+        """Mengirim frame ke klien yang siap. Mengembalikan True bila masih ada entri tertunda."""
+        frames, waiting = [], False
+        with self._lock:
+            now = time.monotonic()
+            for sid, state in self._clients.items():
+                if not state['pending']: continue
+                in_flight_since = state['in_flight_since']
+                if in_flight_since is not None and now - in_flight_since < self.ack_timeout:
+                    waiting = True
+                    continue
+                frames.append((sid, {'entries': state['pending'], 'dropped': state['dropped']}))
+                state['pending'], state['dropped'], state['in_flight_since'] = [], 0, now
+        for sid, payload in frames:
+            socketio.emit('new_log', payload, to=sid, callback=lambda *args, sid=sid: self._ack(sid))
+            self.frames_sent += 1
+        return waiting
+
+    def _ack(self, sid: str):
+        with self._lock:
+            state = self._clients.get(sid)
+            if state:
+                state['in_flight_since'] = None
+        self._wakeup.set()
+
+    def get_stats(self) -> dict:
+        return {
+            'clients': len(self._clients), 'frames_sent': self.frames_sent,
+            'entries_coalesced': self.entries_coalesced
+        }
+
+LOG_LEVEL_CODES = {"INFO": 1, "SUCCESS": 2, "WARNING": 3, "ERROR": 4, "WAIT": 5}
+LOG_ACCOUNT_PATTERN = re.compile(r'\[([^\[\]]+)\]\s*$')
+
+def log_account(title: str) -> str:
+    """Nama akun dari judul log bergaya "Pesan Terkirim [username]"; kosong bila tidak ada."""
+    match = LOG_ACCOUNT_PATTERN.search(title)
+    return match.group(1) if match else ""
+
+class LogHistory:
+    """Riwayat log di disk: segmen JSONL plus index offset berukuran tetap per segmen.
+
+    Setiap entri menambah satu baris ke `segment-N.jsonl` dan satu record ke `segment-N.idx`
+    berisi waktu, offset, panjang, level, dan hash judul/akun. Query membaca index lewat mmap,
+    mencari rentang waktu dengan binary search, menyaring level/judul/akun tanpa menyentuh
+    data, lalu hanya mem-parse baris yang cocok. Hasil terbaru lebih dulu dengan cursor
+    "segmen:posisi" untuk halaman berikutnya.
+    """
+    RECORD = struct.Struct('<dQIIIB3x')  # waktu, offset, panjang, hash judul, hash akun, level
+
+    def __init__(self, directory: str = "log_history", segment_bytes: int = 8 * 2**20, max_segments: int = 64):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._segments = None
+        self._data_file = None
+        self._index_file = None
+        self._size = 0
+        self.appended = 0
+
+    @staticmethod
+    def _hash(text: str) -> int:
+        return zlib.crc32(text.encode('utf-8'))
+
+    def _path(self, segment: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.{suffix}")
+
+    def _load_segments(self) -> list:
+        if self._segments is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._segments = sorted(
+                int(name[8:14]) for name in os.listdir(self.directory)
+                if name.startswith("segment-") and name.endswith(".idx")
+            )
+        return self._segments
+
+    def _open_active(self):
+        segments = self._load_segments()
+        if not segments:
+            segments.append(1)
+        segment = segments[-1]
+        index_path = self._path(segment, "idx")
+        if os.path.exists(index_path):
+            # Buang record setengah jadi dari crash sebelumnya
+            size = os.path.getsize(index_path)
+            if size % self.RECORD.size:
+                os.truncate(index_path, size - size % self.RECORD.size)
+        self._data_file = open(self._path(segment, "jsonl"), 'ab')
+        self._index_file = open(index_path, 'ab')
+        self._size = self._data_file.tell()
+
+    def _rotate(self):
+        self._data_file.close()
+        self._index_file.close()
+        self._segments.append(self._segments[-1] + 1)
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.pop(0)
+            for suffix in ("jsonl", "idx"):
+                try:
+                    os.remove(self._path(oldest, suffix))
+                except FileNotFoundError:
+                    pass
+        self._open_active()
+
+    def append(self, log_entry: dict):
+        line = json.dumps(log_entry, ensure_ascii=False).encode('utf-8') + b'\n'
+        title = log_entry.get('title', '')
+        record_fields = (
+            self._hash(title), self._hash(log_entry.get('account') or log_account(title)),
+            LOG_LEVEL_CODES.get(log_entry.get('level', '').upper(), 0)
+        )
+        with self._lock:
+            if self._data_file is None:
+                self._open_active()
+            elif self._size and self._size + len(line) > self.segment_bytes:
+                self._rotate()
+            self._data_file.write(line)
+            self._index_file.write(self.RECORD.pack(time.time(), self._size, len(line), *record_fields))
+            self._size += len(line)
+            self.appended += 1
+
+    def query(self, cursor: str | None = None, limit: int = 100, since: float | None = None,
+              until: float | None = None, levels=None, title: str | None = None,
+              account: str | None = None) -> tuple[list, str | None]:
+        """Mengembalikan (entri terbaru lebih dulu, cursor berikutnya atau None bila habis)."""
+        start_segment, start_position = None, None
+        if cursor:
+            start_segment, start_position = (int(part) for part in cursor.split(':'))
+        level_codes = {LOG_LEVEL_CODES.get(level.upper(), 0) for level in levels} if levels else None
+        title_hash = self._hash(title) if title else None
+        account_hash = self._hash(account) if account else None
+
+        with self._lock:
+            if self._data_file is not None:
+                self._data_file.flush()
+                self._index_file.flush()
+            segments = list(self._load_segments())
+
+        results = []
+        for segment in reversed(segments):
+            if start_segment is not None and segment > start_segment: continue
+            try:
+                with open(self._path(segment, "idx"), 'rb') as index_file:
+                    size = os.fstat(index_file.fileno()).st_size
+                    count = size // self.RECORD.size
+                    if not count: continue
+                    with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                        timestamp = lambda i: self.RECORD.unpack_from(index, i * self.RECORD.size)[0]
+                        high = count if segment != start_segment else min(count, start_position)
+                        if until is not None:
+                            high = min(high, self._bisect(timestamp, until, 0, high, right=True))
+                        low = self._bisect(timestamp, since, 0, high) if since is not None else 0
+                        position = high - 1
+                        while position >= low and len(results) < limit:
+                            matches = []
+                            while position >= low and len(results) + len(matches) < limit:
+                                _, offset, length, t_hash, a_hash, level = self.RECORD.unpack_from(index, position * self.RECORD.size)
+                                if ((level_codes is None or level in level_codes)
+                                        and (title_hash is None or t_hash == title_hash)
+                                        and (account_hash is None or a_hash == account_hash)):
+                                    matches.append((offset, length))
+                                position -= 1
+                            results.extend(self._read_matches(segment, matches, title, account))
+            except FileNotFoundError:
+                continue  # Segmen terhapus oleh rotasi saat query berjalan
+            if len(results) >= limit:
+                return results[:limit], f"{segment}:{position + 1}"
+            if since is not None and low > 0:
+                break  # Segmen yang lebih lama seluruhnya sebelum `since`
+        return results, None
+
+    @staticmethod
+    def _bisect(timestamp, value: float, low: int, high: int, right: bool = False) -> int:
+        while low < high:
+            middle = (low + high) // 2
+            if timestamp(middle) < value or (right and timestamp(middle) == value):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _read_matches(self, segment: int, matches: list, title: str | None, account: str | None) -> list:
+        if not matches: return []
+        entries = []
+        with open(self._path(segment, "jsonl"), 'rb') as data_file:
+            with mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for offset, length in matches:
+                    entry = json.loads(data[offset:offset + length])
+                    # Hash bisa bertabrakan: pastikan kecocokan yang sebenarnya
+                    if title and entry.get('title') != title: continue
+                    if account and (entry.get('account') or log_account(entry.get('title', ''))) != account: continue
+                    entries.append(entry)
+        return entries
+
+    def close(self):
+        with self._lock:
+            if self._data_file is not None:
+                self._data_file.close()
+                self._index_file.close()
+                self._data_file = self._index_file = None
+
+    def get_stats(self) -> dict:
+        return {'segments': len(self._segments or ()), 'appended': self.appended}
+
+log_broadcaster = LogBroadcaster()
+log_history = LogHistory(os.getenv('LOG_HISTORY_DIR', 'log_history'))
+atexit.register(log_history.close)
+
+def restore_system_logs():
+    """Mengisi ulang system_logs dari riwayat log di disk (log sebelum restart)."""
+    entries, _ = log_history.query(limit=system_logs.maxlen - len(system_logs))
+    system_logs.extendleft(entries)
+
+log_pipeline = LogPipeline(
+    maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    console_enabled=os.getenv('LOG_CONSOLE', 'true').lower() == 'true'
+)
+
 # --- Utility Functions ---
 def log_message(title: str, message: str, level: str = "INFO"):
-    """Mencetak pesan log ke konsol dan menyimpan untuk web panel."""
+    """Mencatat pesan log untuk konsol, file, dan web panel tanpa memblokir pemanggil."""
     color_map = {
         "SUCCESS": "green", "ERROR": "red", "WARNING": "yellow",
         "WAIT": "cyan", "INFO": "blue"
@@ -52,139 +676,1127 @@ def log_message(title: str, message: str, level: str = "INFO"):
     color = color_map.get(level.upper(), "white")
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    panel_content = f"[b]{timestamp}[/b]\n\n{message}"
-    console.print(
-        Panel(
-            panel_content,
-            title=f"[{color}]{title}[/{color}]",
-            expand=False,
-            border_style=color
-        )
-    )
-    
-    log_entry = {
+    log_pipeline.submit({
         'timestamp': timestamp, 'title': title, 'message': message,
         'level': level, 'color': color
-    }
-    system_logs.append(log_entry)
-    if len(system_logs) > MAX_LOGS:
-        system_logs.pop(0)
-    
-    socketio.emit('new_log', log_entry)
-    
-    if level == "ERROR":
-        app.logger.error(f"{title}: {message}")
-    elif level == "WARNING":
-        app.logger.warning(f"{title}: {message}")
-    else:
-        app.logger.info(f"{title}: {message}")
+    })
 
 def clean_discord_mentions(text: str) -> str:
     """Menghapus semua jenis mention dari teks pesan Discord."""
     return re.sub(r'<@!?\d+>|<#\d+>|<@&\d+>|\s+', ' ', text).strip()
 
-def get_api_key(used_keys: set, all_keys: list, cooldown_seconds: int) -> str | None:
-    """Mendapatkan Google API key yang tersedia secara acak dan menangani cooldown."""
-    available_keys = [key for key in all_keys if key not in used_keys]
-    if not available_keys:
-        log_message(
-            "Cooldown API",
-            f"Semua API key sedang dalam masa cooldown. Menunggu {cooldown_seconds // 3600} jam...",
-            "WAIT"
+# --- Metrics ---
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Histogram kumulatif bergaya Prometheus dengan batas bucket tetap."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Counter dan histogram ringan untuk endpoint /metrics (format teks Prometheus).
+
+    Pencatatan hanya berupa lookup dict dan penambahan di bawah satu lock; render
+    dilakukan saat endpoint di-scrape.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        self._meta[name] = (kind, help_text, buckets)
+        self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(labels.items())
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._meta[name][2])
+            histogram.observe(value)
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs: return ""
+        escaped = (
+            f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), " ")}"'
+            for k, v in pairs
         )
-        time.sleep(cooldown_seconds)
-        used_keys.clear()
-        log_message("Cooldown Selesai", "Mencoba kembali dengan semua API key.", "SUCCESS")
-        return random.choice(all_keys) if all_keys else None
-    return random.choice(available_keys)
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self, gauges: list = ()) -> str:
+        """Merender semua metrik; `gauges` berisi (nama, help, [(labels, nilai), ...]) yang dihitung saat scrape."""
+        lines = []
+        with self._lock:
+            for name, series in self._values.items():
+                kind, help_text, _ = self._meta[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in series.items():
+                    if kind != "histogram":
+                        lines.append(f"{name}{self._labels(key)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + ('+Inf',), value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._labels(key)} {value.sum}")
+                    lines.append(f"{name}_count{self._labels(key)} {value.count}")
+        for name, help_text, samples in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{self._labels(tuple(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe('discord_requests_total', 'counter', 'Request Discord API per akun, route, dan status HTTP.')
+metrics.describe('discord_request_duration_seconds', 'histogram', 'Latensi request Discord API per akun dan route.')
+metrics.describe('discord_rate_limited_total', 'counter', 'Respons 429 per akun dan route.')
+metrics.describe('discord_rate_limit_wait_seconds_total', 'counter', 'Total detik menunggu bucket rate limit per akun.')
+metrics.describe('gemini_requests_total', 'counter', 'Panggilan Gemini per hasil (success, blocked, quota, error).')
+metrics.describe('gemini_request_duration_seconds', 'histogram', 'Latensi panggilan Gemini.')
+metrics.describe('poll_lag_seconds', 'histogram', 'Keterlambatan poll channel dibanding jadwal delay_interval.',
+                 buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0))
+
+# --- State Store ---
+def token_digest(token: str) -> str:
+    """Hash token untuk dipakai sebagai key penyimpanan; token tidak pernah ditulis apa adanya."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class StateStore:
+    """Penyimpanan state runtime di SQLite (mode WAL) dengan write-behind.
+
+    Pemilik state cukup memanggil `mark_dirty(namespace, key, producer)` — operasi O(1) tanpa
+    I/O. Satu job scheduler mem-flush semua key kotor setiap FLUSH_INTERVAL detik dalam satu
+    transaksi; `producer()` baru dipanggil saat flush sehingga perubahan beruntun pada key yang
+    sama hanya ditulis sekali. Database baru dibuka saat pertama kali dibutuhkan dan setiap
+    pemilik memuat state-nya sendiri ketika dibuat.
+    """
+    FLUSH_INTERVAL = 2.0
+
+    def __init__(self, filename: str = "bot_state.db"):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._dirty = {}
+        self._flush_job = None
+        self.flush_count = 0
+        self.rows_written = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.filename, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, namespace: str, key: str, default=None):
+        """Membaca satu nilai; nilai yang belum di-flush diambil langsung dari pemiliknya."""
+        with self._lock:
+            producer = self._dirty.get((namespace, key))
+        if producer is not None:
+            value = producer()
+            return default if value is None else value
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def mark_dirty(self, namespace: str, key: str, producer):
+        """Menandai key untuk ditulis pada flush berikutnya; `producer()` None berarti hapus."""
+        with self._lock:
+            self._dirty[(namespace, key)] = producer
+            self._ensure_flush()
+
+    def _ensure_flush(self):
+        if self._flush_job is None:
+            self._flush_job = scheduler.schedule(self.FLUSH_INTERVAL, self._flush_tick, name="state-flush")
+
+    def _flush_tick(self):
+        self.flush()
+        return None
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if self._flush_job: scheduler.cancel(self._flush_job)
+            self._flush_job = None
+        if not dirty: return
+
+        upserts, deletes = [], []
+        now = time.time()
+        for (namespace, key), producer in dirty.items():
+            try:
+                value = producer()
+            except Exception as e:
+                log_message("State Store", f"Gagal membaca state {namespace}/{key}: {str(e)}", "ERROR")
+                continue
+            if value is None:
+                deletes.append((namespace, key))
+            else:
+                upserts.append((namespace, key, json.dumps(value), now))
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO kv (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)", upserts)
+                conn.executemany("DELETE FROM kv WHERE namespace = ? AND key = ?", deletes)
+        self.flush_count += 1
+        self.rows_written += len(upserts) + len(deletes)
+
+    def close(self):
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            pending = len(self._dirty)
+        return {'pending_writes': pending, 'flush_count': self.flush_count, 'rows_written': self.rows_written}
+
+state_store = StateStore(os.getenv('STATE_DB', 'bot_state.db'))
+atexit.register(state_store.close)
+
+# --- API Key Pool ---
+class ApiKeyPool:
+    """Pool Google API key dengan cooldown per key dan pemilihan least-recently-used.
+
+    Pemanggil tidak pernah diblokir: bila semua key sedang cooldown, acquire() langsung
+    mengembalikan (None, waktu_tersedia_berikutnya). Key masuk cooldown otomatis saat
+    Gemini mengembalikan error quota/429; lamanya berlipat dua untuk kegagalan berturut-turut
+    sampai batas `cooldown_seconds`.
+    """
+    BASE_COOLDOWN_SECONDS = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}
+        self.cooldown_seconds = 86400
+
+    def configure(self, keys: list, cooldown_seconds: int):
+        """Memperbarui daftar key; status key yang masih ada dipertahankan."""
+        with self._lock:
+            self.cooldown_seconds = cooldown_seconds
+            self._keys = {key: self._keys.get(key) or self._restore(key) for key in keys}
+
+    @staticmethod
+    def _restore(key: str) -> dict:
+        """State baru untuk key, dengan cooldown yang masih berlaku dari run sebelumnya."""
+        saved = state_store.get('api_keys', token_digest(key), {})
+        return {
+            'cooldown_until': saved.get('cooldown_until', 0.0), 'last_used': 0.0, 'uses': 0,
+            'failures': saved.get('failures', 0)
+        }
+
+    def _persist(self, key: str, state: dict):
+        state_store.mark_dirty('api_keys', token_digest(key), lambda: (
+            {'cooldown_until': state['cooldown_until'], 'failures': state['failures']} if state['failures'] else None
+        ))
+
+    def acquire(self) -> tuple[str | None, float | None]:
+        """Mengembalikan (key, None), atau (None, epoch saat key berikutnya tersedia)."""
+        with self._lock:
+            if not self._keys:
+                return None, None
+            now = time.time()
+            available = [(state['last_used'], random.random(), key) for key, state in self._keys.items() if state['cooldown_until'] <= now]
+            if not available:
+                return None, min(state['cooldown_until'] for state in self._keys.values())
+            key = min(available)[2]
+            state = self._keys[key]
+            state['last_used'] = now
+            state['uses'] += 1
+            return key, None
+
+    def report_success(self, key: str):
+        with self._lock:
+            state = self._keys.get(key)
+            if state and state['failures']:
+                state['failures'] = 0
+                self._persist(key, state)
+
+    def report_quota_error(self, key: str) -> float:
+        """Memasukkan key ke cooldown; mengembalikan lama cooldown dalam detik."""
+        with self._lock:
+            state = self._keys.get(key)
+            if not state: return 0.0
+            state['failures'] += 1
+            cooldown = min(self.cooldown_seconds, self.BASE_COOLDOWN_SECONDS * 2 ** (state['failures'] - 1))
+            state['cooldown_until'] = time.time() + cooldown
+            self._persist(key, state)
+            return cooldown
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            now = time.time()
+            keys = [{
+                'key_preview': f"...{key[-4:]}",
+                'available': state['cooldown_until'] <= now,
+                'cooldown_until': datetime.fromtimestamp(state['cooldown_until']).strftime('%Y-%m-%d %H:%M:%S') if state['cooldown_until'] > now else None,
+                'uses': state['uses'], 'failures': state['failures']
+            } for key, state in self._keys.items()]
+        return {
+            'total_keys': len(keys), 'available_keys': sum(1 for k in keys if k['available']),
+            'keys': keys
+        }
+
+api_key_pool = ApiKeyPool()
+
+def _is_quota_error(error: Exception) -> bool:
+    text = str(error).lower()
+    return (type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+            or "429" in text or "quota" in text or "rate limit" in text)
+
+# --- Response Cache ---
+class ResponseCache:
+    """Cache LRU + TTL untuk respons AI, dengan key hash jendela percakapan yang dinormalisasi.
+
+    Normalisasi mengabaikan huruf besar/kecil, tanda baca, spasi berlebih dan huruf yang
+    dipanjangkan ("gmmm" == "gmm", tetapi "gm" tetap berbeda; angka tidak diubah), sehingga
+    percakapan yang identik atau nyaris identik tidak menghabiskan quota API key lagi.
+    """
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 600):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_size: int, ttl_seconds: float):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl_seconds = ttl_seconds
+            while len(self._entries) > max(0, max_size):
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        text = re.sub(r'[^\w\s]', ' ', text.lower())
+        # Huruf yang dipanjangkan dipotong jadi dua ("gmmm" == "gmm", "sooo" == "soo");
+        # angka tidak disentuh agar "1000" dan "10" tetap berbeda
+        text = re.sub(r'([^\W\d_])\1{2,}', r'\1\1', text)
+        return ' '.join(text.split())
+
+    @classmethod
+    def make_key(cls, conversation: list) -> str:
+        normalized = '\n'.join(cls._normalize(text) for text in conversation)
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, response_text: str):
+        with self._lock:
+            if self.max_size <= 0: return
+            self._entries[key] = (response_text, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries), 'max_size': self.max_size, 'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
+
+response_cache = ResponseCache()
+
+# --- Gemini Backends ---
+GEMINI_MODEL_NAME = "gemini-1.5-flash-latest"
+GEMINI_SAFETY_SETTINGS = (
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+)
+
+class GoogleGeminiBackend:
+    """Backend Gemini asli dengan cache model per API key.
+
+    Model dibuat sekali per key. genai.configure() mengubah state global SDK, jadi hanya
+    dipanggil di bawah lock saat membuat model baru, lalu client-nya langsung diikat ke
+    model tersebut sehingga pemanggilan paralel dengan key berbeda tidak saling menimpa.
+    """
+    name = "google"
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME, safety_settings=GEMINI_SAFETY_SETTINGS):
+        self.model_name = model_name
+        self.safety_settings = [dict(setting) for setting in safety_settings]
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _get_model(self, api_key: str):
+        model = self._models.get(api_key)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(api_key)
+            if model is None:
+                genai = profiled_import('google.generativeai')
+                genai_client = profiled_import('google.generativeai.client')
+                genai.configure(api_key=api_key)
+                model = genai.GenerativeModel(model_name=self.model_name, safety_settings=self.safety_settings)
+                model._client = genai_client.get_default_generative_client()
+                self._models[api_key] = model
+        return model
+
+    def generate(self, api_key: str, prompt: str) -> str | None:
+        """Mengembalikan teks respons, atau None bila diblokir filter keamanan / kosong."""
+        response = self._get_model(api_key).generate_content(prompt)
+        return response.text if response.parts else None
+
+class StubGeminiBackend:
+    """Backend lokal tanpa jaringan untuk test dan benchmark, dengan latensi yang bisa diatur."""
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, reply: str = "ngl that's a solid take, we're still early fr"):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+
+    def generate(self, api_key: str, prompt: str) -> str | None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.reply
+
+def create_gemini_backend(name: str):
+    if name == "stub":
+        return StubGeminiBackend(latency=float(os.getenv('GEMINI_STUB_LATENCY', 0)))
+    return GoogleGeminiBackend()
+
+gemini_backend = create_gemini_backend(os.getenv('GEMINI_BACKEND', 'google'))
+
+def set_gemini_backend(backend):
+    """Mengganti backend AI (mis. StubGeminiBackend untuk test/benchmark)."""
+    global gemini_backend
+    gemini_backend = backend
 
 def generate_gemini_response(api_key: str, prompt: str) -> str | None:
     """Menghasilkan respons menggunakan Google Gemini Pro."""
+    start = time.perf_counter()
     try:
-        genai.configure(api_key=api_key)
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        ]
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash-latest", safety_settings=safety_settings)
-        response = model.generate_content(prompt)
-        
-        if response.parts:
-            return response.text
-        else:
-            log_message("Gemini Response", "Respons diblokir oleh filter keamanan atau kosong.", "WARNING")
-            return None
+        response_text = gemini_backend.generate(api_key, prompt)
+        metrics.observe('gemini_request_duration_seconds', time.perf_counter() - start)
+        api_key_pool.report_success(api_key)
+        if response_text:
+            metrics.inc('gemini_requests_total', result="success")
+            return response_text
+        metrics.inc('gemini_requests_total', result="blocked")
+        log_message("Gemini Response", "Respons diblokir oleh filter keamanan atau kosong.", "WARNING")
+        return None
             
     except Exception as e:
+        metrics.observe('gemini_request_duration_seconds', time.perf_counter() - start)
+        if _is_quota_error(e):
+            metrics.inc('gemini_requests_total', result="quota")
+            cooldown = api_key_pool.report_quota_error(api_key)
+            log_message("Cooldown API", f"API key ...{api_key[-4:]} terkena quota/429. Cooldown {cooldown:.0f} detik.", "WAIT")
+            return None
+        metrics.inc('gemini_requests_total', result="error")
         log_message("Gemini Error", f"Gagal menghasilkan respons: {str(e)}", "ERROR")
         return None
 
+# --- Scheduler ---
+class ScheduledJob:
+    """Satu tugas terjadwal. Callback mengembalikan jeda berikutnya (detik) atau None untuk berhenti."""
+    __slots__ = ('callback', 'name', 'cancelled', 'queued')
+
+    def __init__(self, callback, name: str):
+        self.callback = callback
+        self.name = name
+        self.cancelled = False
+        self.queued = False
+
+class Scheduler:
+    """Penjadwal tunggal berbasis heap (waktu jatuh tempo) untuk semua polling dan chatter handler.
+
+    Satu thread dispatcher menunggu tugas terdekat, lalu menjalankannya di thread pool
+    kecil. Tugas dijadwalkan ulang setelah selesai sehingga satu tugas tidak pernah
+    berjalan ganda.
+    """
+    def __init__(self, max_workers: int = 16):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._cancelled_in_heap = 0
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scheduler", initializer=self._mark_worker
+        )
+        self._thread = None
+
+    def _mark_worker(self):
+        self._local.is_worker = True
+
+    def on_worker_thread(self) -> bool:
+        """True bila dipanggil dari thread pool scheduler (tempat tugas tidak boleh tidur lama)."""
+        return getattr(self._local, 'is_worker', False)
+
+    def schedule(self, delay: float, callback, name: str = "job") -> ScheduledJob:
+        job = ScheduledJob(callback, name)
+        self._push(job, delay)
+        return job
+
+    def cancel(self, job: ScheduledJob):
+        with self._cond:
+            if job.cancelled: return
+            job.cancelled = True
+            if not job.queued: return
+            self._cancelled_in_heap += 1
+            # Bersihkan heap bila terlalu banyak tugas yang sudah dibatalkan
+            if self._cancelled_in_heap > 64 and self._cancelled_in_heap > len(self._heap) // 2:
+                for entry in self._heap:
+                    if entry[2].cancelled: entry[2].queued = False
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled_in_heap = 0
+            self._cond.notify()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._heap) - self._cancelled_in_heap
+
+    def _push(self, job: ScheduledJob, delay: float):
+        with self._cond:
+            if job.cancelled: return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._dispatch_loop, name="scheduler-dispatch", daemon=True)
+                self._thread.start()
+            job.queued = True
+            heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._counter), job))
+            self._cond.notify()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)[2].queued = False
+                        self._cancelled_in_heap -= 1
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0: break
+                    self._cond.wait(wait)
+                _, _, job = heapq.heappop(self._heap)
+                job.queued = False
+            self._executor.submit(self._run_job, job)
+
+    def _run_job(self, job: ScheduledJob):
+        if job.cancelled: return
+        try:
+            next_delay = job.callback()
+        except Exception as e:
+            log_message("Scheduler Error", f"{job.name}: {str(e)}", "ERROR")
+            next_delay = None
+        if next_delay is not None and not job.cancelled:
+            self._push(job, next_delay)
+
+scheduler = Scheduler(max_workers=int(os.getenv('SCHEDULER_WORKERS', 16)))
+
+# --- Reply Workers ---
+class ReplyWorkerPool:
+    """Pool worker terbatas untuk pembuatan balasan AI, terpisah dari polling channel.
+
+    Handler hanya memasukkan job ke antrean lalu kembali, sehingga latensi Gemini tidak
+    menunda polling berikutnya. Setiap job membawa nomor generasi handler; job yang sudah
+    digantikan balasan lebih baru di channel yang sama dibuang (coalesced).
+    """
+    def __init__(self, concurrency: int = 4, queue_size: int = 100):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self.concurrency = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.in_progress = 0
+        self.max_depth = 0
+        self.configure(concurrency, queue_size)
+
+    def configure(self, concurrency: int, queue_size: int):
+        """Mengubah jumlah worker dan kapasitas antrean tanpa membuang job yang sedang antre."""
+        with self._lock:
+            self._queue.maxsize = max(1, queue_size)
+            self.concurrency = max(1, concurrency)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            # Worker berlebih berhenti setelah menerima sentinel (atau setelah job berikutnya)
+            for _ in range(len(self._threads) - self.concurrency):
+                try:
+                    self._queue.put_nowait(None)
+                except queue.Full:
+                    break
+            for index in range(len(self._threads), self.concurrency):
+                thread = threading.Thread(target=self._worker_loop, args=(index,), name=f"reply-worker-{index}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def submit(self, handler, generation: int, args: tuple) -> bool:
+        try:
+            self._queue.put_nowait((handler, generation, args))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def record_coalesced(self):
+        with self._lock:
+            self.coalesced += 1
+
+    def _worker_loop(self, index: int):
+        while index < self.concurrency:
+            job = self._queue.get()
+            try:
+                if job is None: continue
+                handler, generation, args = job
+                if not handler.is_reply_current(generation):
+                    self.record_coalesced()
+                    continue
+                with self._lock:
+                    self.in_progress += 1
+                try:
+                    handler._generate_and_send_reply(*args, generation)
+                finally:
+                    with self._lock:
+                        self.in_progress -= 1
+                        self.completed += 1
+            except Exception as e:
+                log_message("Reply Worker Error", str(e), "ERROR")
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'concurrency': self.concurrency, 'queue_depth': self._queue.qsize(),
+                'queue_size': self._queue.maxsize, 'max_depth': self.max_depth,
+                'in_progress': self.in_progress, 'submitted': self.submitted,
+                'completed': self.completed, 'dropped': self.dropped, 'coalesced': self.coalesced
+            }
+
+reply_workers = ReplyWorkerPool()
+
+# --- HTTP Connection Pooling ---
+class ConnectionStats:
+    """Statistik koneksi HTTP per akun: request, koneksi baru vs dipakai ulang, waktu handshake."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.handshake_total = 0.0
+        self.handshake_max = 0.0
+        self.bytes_received = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_bytes(self, count: int):
+        with self._lock:
+            self.bytes_received += count
+
+    def record_connection(self, handshake_seconds: float):
+        with self._lock:
+            self.new_connections += 1
+            self.handshake_total += handshake_seconds
+            self.handshake_max = max(self.handshake_max, handshake_seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                'requests': self.requests, 'new_connections': self.new_connections,
+                'reused_connections': reused,
+                'reuse_rate': round(reused / self.requests, 3) if self.requests else 0,
+                'avg_handshake_ms': round(self.handshake_total / self.new_connections * 1000, 2) if self.new_connections else 0,
+                'max_handshake_ms': round(self.handshake_max * 1000, 2),
+                'bytes_received': self.bytes_received
+            }
+
+def _instrumented_pool(base_pool, stats: ConnectionStats):
+    """Membuat subclass connection pool urllib3 yang mencatat setiap handshake TCP/TLS baru."""
+    class InstrumentedPool(base_pool):
+        def _new_conn(self):
+            conn = super()._new_conn()
+            connect = conn.connect
+            def timed_connect():
+                start = time.perf_counter()
+                connect()
+                stats.record_connection(time.perf_counter() - start)
+            conn.connect = timed_connect
+            return conn
+    return InstrumentedPool
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter dengan connection pool keep-alive yang terinstrumentasi."""
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _instrumented_pool(HTTPConnectionPool, self.stats),
+            'https': _instrumented_pool(HTTPSConnectionPool, self.stats)
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+# --- Rate Limiting ---
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Request dibatalkan karena rate limit melebihi batas tunggu atau batas retry."""
+
+class RateLimitDeferred(RateLimitExceeded):
+    """Request di thread scheduler ditunda: tugas pemanggil sebaiknya dijadwalkan ulang setelah `retry_after` detik."""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimitBucket:
+    """Satu bucket rate limit dengan reservasi slot berbasis jendela waktu (tanpa sleep di dalam lock)."""
+    __slots__ = ('limit', 'remaining', 'window', 'window_start', 'reset_at')
+
+    def __init__(self, limit: int = 1, window: float = 0.0):
+        self.limit = limit
+        self.remaining = limit
+        self.window = window
+        self.window_start = 0.0
+        self.reset_at = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Memesan satu slot dan mengembalikan berapa detik harus menunggu sebelum request dikirim."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.window_start = now
+            self.reset_at = now + self.window
+        if self.remaining <= 0:
+            # Jendela sekarang habis: pesan slot di jendela berikutnya
+            self.window_start = self.reset_at
+            self.reset_at = self.window_start + self.window
+            self.remaining = self.limit
+        self.remaining -= 1
+        return max(0.0, self.window_start - now)
+
+    def update(self, now: float, limit: int, remaining: int, reset_after: float):
+        if self.window_start > now: return  # Slot sudah dipesan di jendela mendatang
+        if remaining == limit - 1 or not self.window:
+            self.window = reset_after
+        self.limit = limit
+        self.remaining = min(self.remaining, remaining)
+        self.reset_at = now + reset_after
+
+    def wait_time(self, now: float) -> float:
+        """Lama tunggu sampai slot berikutnya tersedia, tanpa memesan slot."""
+        if now >= self.reset_at: return 0.0
+        if self.remaining > 0: return max(0.0, self.window_start - now)
+        return self.reset_at - now
+
+    def exhaust(self, now: float, retry_after: float):
+        self.remaining = 0
+        self.window_start = now
+        self.reset_at = now + retry_after
+
+class RateLimiter:
+    """Rate limiter bergaya Discord per akun: bucket per route (dari header X-RateLimit-*) plus limit global."""
+    GLOBAL_LIMIT_PER_SECOND = 50
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._route_buckets = {}
+        self._buckets = {}
+        self._global = RateLimitBucket(self.GLOBAL_LIMIT_PER_SECOND, 1.0)
+        self.rate_limited_count = 0
+        self.wait_count = 0
+        self.wait_seconds = 0.0
+        self.deferred_count = 0
+
+    def _bucket(self, route: str, major: str) -> RateLimitBucket:
+        bucket_hash = self._route_buckets.get(route, route)
+        key = f"{bucket_hash}:{major}"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = RateLimitBucket()
+        return bucket
+
+    def acquire(self, route: str, major: str) -> float:
+        """Memesan slot untuk route ini; mengembalikan lama tunggu (detik) yang diperlukan."""
+        with self._lock:
+            now = time.monotonic()
+            return max(self._global.reserve(now), self._bucket(route, major).reserve(now))
+
+    def peek(self, route: str, major: str) -> float:
+        """Seperti acquire tetapi tanpa memesan slot; dipakai antrean latar untuk menunda diri."""
+        with self._lock:
+            now = time.monotonic()
+            return max(self._global.wait_time(now), self._bucket(route, major).wait_time(now))
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_seconds += seconds
+
+    def record_deferral(self):
+        with self._lock:
+            self.deferred_count += 1
+
+    def update(self, route: str, major: str, response) -> float | None:
+        """Memperbarui bucket dari header respons. Mengembalikan retry_after bila respons 429."""
+        headers = response.headers
+        with self._lock:
+            now = time.monotonic()
+            bucket_hash = headers.get("X-RateLimit-Bucket")
+            if bucket_hash and self._route_buckets.get(route) != bucket_hash:
+                self._route_buckets[route] = bucket_hash
+            bucket = self._bucket(route, major)
+            try:
+                if "X-RateLimit-Remaining" in headers:
+                    bucket.update(
+                        now, int(headers.get("X-RateLimit-Limit", 1)),
+                        int(headers["X-RateLimit-Remaining"]),
+                        float(headers.get("X-RateLimit-Reset-After", 1.0))
+                    )
+            except ValueError:
+                pass
+
+            if response.status_code != 429:
+                return None
+            self.rate_limited_count += 1
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            retry_after = float(body.get("retry_after", headers.get("Retry-After", 1.0)))
+            if body.get("global") or headers.get("X-RateLimit-Global"):
+                self._global.exhaust(now, retry_after)
+            else:
+                bucket.exhaust(now, retry_after)
+            return retry_after
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'rate_limited_count': self.rate_limited_count,
+                'wait_count': self.wait_count,
+                'wait_seconds': round(self.wait_seconds, 2),
+                'deferred_count': self.deferred_count,
+                'tracked_buckets': len(self._buckets)
+            }
+
 # --- Bot Logic Classes ---
-class LocalMessageManager:
-    """Mengelola pesan lokal dengan sistem anti-repeat yang cerdas."""
-    def __init__(self, filename: str = "pesan.txt"):
+CRYPTO_KEYWORDS = frozenset({
+    'bitcoin', 'btc', 'ethereum', 'eth', 'crypto', 'blockchain', 'defi', 'nft', 
+    'trading', 'hodl', 'pump', 'dump', 'moon', 'lambo', 'gem', 'ath', 'dip'
+})
+
+class MessageCorpus:
+    """Isi pesan.txt yang sudah di-parse dan di-index. Immutable dan dipakai bersama semua handler.
+
+    Setiap pesan di-tokenisasi sekali (token di-intern) dan dimasukkan ke inverted index
+    token -> daftar indeks pesan.
+    """
+    def __init__(self, filename: str, messages: list, signature: tuple | None):
         self.filename = filename
-        self.all_messages = self._load_messages()
-        self.used_messages = set()
-        
-    def _load_messages(self) -> list:
+        self.messages = tuple(messages)
+        self.signature = signature
+        self.token_sets = []
+        self.index = {}
+        self.crypto_indices = []
+        self.is_crypto = bytearray(len(self.messages))
+        for i, message in enumerate(self.messages):
+            tokens = frozenset(sys.intern(token) for token in message.lower().split())
+            self.token_sets.append(tokens)
+            for token in tokens:
+                self.index.setdefault(token, []).append(i)
+            if not tokens.isdisjoint(CRYPTO_KEYWORDS):
+                self.crypto_indices.append(i)
+                self.is_crypto[i] = 1
+
+    @staticmethod
+    def file_signature(filename: str) -> tuple | None:
         try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
+            stat = os.stat(filename)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, filename: str) -> 'MessageCorpus':
+        signature = cls.file_signature(filename)
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
                 messages = [line.strip() for line in f if line.strip()]
-                if not messages:
-                    log_message("Peringatan", f"File {self.filename} kosong.", "WARNING")
-                    return []
-                log_message("Local Messages", f"Berhasil memuat {len(messages)} pesan dari {self.filename}", "SUCCESS")
-                return messages
+            if messages:
+                log_message("Local Messages", f"Berhasil memuat {len(messages)} pesan dari {filename}", "SUCCESS")
+            else:
+                log_message("Peringatan", f"File {filename} kosong.", "WARNING")
         except FileNotFoundError:
-            log_message("Peringatan", f"File {self.filename} tidak ditemukan.", "WARNING")
-            return []
+            log_message("Peringatan", f"File {filename} tidak ditemukan.", "WARNING")
+            messages = []
+        return cls(filename, messages, signature)
+
+message_corpora = {}
+message_corpora_lock = threading.Lock()
+CORPUS_CHECK_INTERVAL = 2.0
+
+def get_message_corpus(filename: str = "pesan.txt") -> MessageCorpus:
+    """Mengembalikan korpus bersama; dimuat ulang secara atomik bila mtime/ukuran file berubah."""
+    entry = message_corpora.get(filename)
+    if entry and time.monotonic() - entry[1] < CORPUS_CHECK_INTERVAL:
+        return entry[0]
+    with message_corpora_lock:
+        now = time.monotonic()
+        entry = message_corpora.get(filename)
+        if entry and now - entry[1] < CORPUS_CHECK_INTERVAL:
+            return entry[0]
+        if entry and entry[0].signature == MessageCorpus.file_signature(filename):
+            message_corpora[filename] = (entry[0], now)
+            return entry[0]
+        corpus = MessageCorpus.load(filename)
+        message_corpora[filename] = (corpus, now)
+        return corpus
+
+def invalidate_message_corpus(filename: str = "pesan.txt"):
+    """Memaksa pengecekan ulang file pada pemanggilan get_message_corpus berikutnya."""
+    with message_corpora_lock:
+        entry = message_corpora.get(filename)
+        if entry:
+            message_corpora[filename] = (entry[0], float('-inf'))
+
+class LocalMessageManager:
+    """Mengelola pesan lokal dengan sistem anti-repeat yang cerdas.
+
+    Korpus pesan dipakai bersama (lihat get_message_corpus); tiap handler hanya menyimpan
+    bitmap pesan yang sudah dipakai. Pemilihan berbasis konteks hanya menilai pesan yang
+    berbagi token langka dengan konteks.
+    """
+    CANDIDATE_BUDGET = 2000
+    CANDIDATE_SAMPLE = 256
+    CRYPTO_BONUS = 0.2
+    RANDOM_PICK_ATTEMPTS = 32
+
+    def __init__(self, filename: str = "pesan.txt", state_key: str | None = None):
+        self.filename = filename
+        self.state_key = None
+        self._corpus = get_message_corpus(filename)
+        self._reset_used()
+        self.state_key = state_key
+        if state_key:
+            self._restore_used()
+
+    def _restore_used(self):
+        """Memuat bitmap pesan terpakai dari state store bila pesan.txt belum berubah sejak disimpan."""
+        saved = state_store.get('used_messages', self.state_key)
+        if not saved or saved.get('signature') != list(self._corpus.signature or ()): return
+        used = zlib.decompress(base64.b64decode(saved['used']))
+        if len(used) != len(self._used): return
+        for index, flag in enumerate(used):
+            if flag: self._mark_used(index)
+
+    def _snapshot_used(self) -> dict:
+        return {
+            'signature': list(self._corpus.signature or ()),
+            'used': base64.b64encode(zlib.compress(bytes(self._used))).decode('ascii')
+        }
+
+    def _persist(self):
+        if self.state_key:
+            state_store.mark_dirty('used_messages', self.state_key, self._snapshot_used)
+
+    @property
+    def all_messages(self) -> tuple:
+        return self._corpus.messages
+
+    def _reset_used(self):
+        self._used = bytearray(len(self._corpus.messages))
+        self._used_count = 0
+        self._used_crypto_count = 0
+        self._persist()
+
+    def _refresh_corpus(self):
+        """Pindah ke korpus terbaru bila file berubah, dengan mempertahankan pesan yang sudah dipakai."""
+        corpus = get_message_corpus(self.filename)
+        if corpus is self._corpus: return
+        old_messages = self._corpus.messages
+        used_messages = {old_messages[i] for i in range(len(old_messages)) if self._used[i]}
+        self._corpus = corpus
+        self._reset_used()
+        if used_messages:
+            for i, message in enumerate(corpus.messages):
+                if message in used_messages:
+                    self._mark_used(i)
+
+    def _similarity(self, message_words: frozenset, context_words: frozenset, context_is_crypto: bool) -> float:
+        if not message_words or not context_words: return 0.0
+        intersection = len(message_words & context_words)
+        jaccard = intersection / (len(message_words) + len(context_words) - intersection)
+        crypto_bonus = self.CRYPTO_BONUS if context_is_crypto and not message_words.isdisjoint(CRYPTO_KEYWORDS) else 0.0
+        return min(jaccard + crypto_bonus, 1.0)
     
     def _calculate_context_similarity(self, message: str, context: str) -> float:
         if not context: return 0.0
-        message_words = set(message.lower().split())
-        context_words = set(context.lower().split())
-        if not message_words or not context_words: return 0.0
-        
-        intersection = len(message_words.intersection(context_words))
-        union = len(message_words.union(context_words))
-        jaccard = intersection / union if union > 0 else 0.0
-        
-        crypto_keywords = {
-            'bitcoin', 'btc', 'ethereum', 'eth', 'crypto', 'blockchain', 'defi', 'nft', 
-            'trading', 'hodl', 'pump', 'dump', 'moon', 'lambo', 'gem', 'ath', 'dip'
-        }
-        crypto_bonus = 0.2 if crypto_keywords.intersection(context_words) and crypto_keywords.intersection(message_words) else 0.0
-        return min(jaccard + crypto_bonus, 1.0)
+        context_words = frozenset(context.lower().split())
+        return self._similarity(
+            frozenset(message.lower().split()), context_words,
+            not context_words.isdisjoint(CRYPTO_KEYWORDS)
+        )
+
+    def _sample(self, pool, exclude=(), skip_crypto: bool = False) -> int | None:
+        """Memilih indeks acak yang belum dipakai dari `pool` (rejection sampling, lalu scan bila perlu)."""
+        if not pool: return None
+        is_crypto = self._corpus.is_crypto
+        def acceptable(i):
+            return not self._used[i] and i not in exclude and not (skip_crypto and is_crypto[i])
+        for _ in range(self.RANDOM_PICK_ATTEMPTS):
+            i = pool[random.randrange(len(pool))]
+            if acceptable(i):
+                return i
+        remaining = [i for i in pool if acceptable(i)]
+        return random.choice(remaining) if remaining else None
+
+    def _mark_used(self, index: int):
+        if not self._used[index]:
+            self._used[index] = 1
+            self._used_count += 1
+            self._used_crypto_count += self._corpus.is_crypto[index]
+            self._persist()
+
+    def _pick_for_context(self, context_words: frozenset, available_count: int) -> int | None:
+        """Memilih acak dari sepertiga teratas pesan tersedia menurut skor kemiripan konteks.
+
+        Urutan skor dibagi menjadi tingkatan: kandidat dengan token sama di atas bonus crypto,
+        pesan crypto tanpa token sama (skor tepat sebesar bonus, jadi cukup disampel), kandidat
+        lain, lalu pesan tanpa kemiripan. Posting list dimasukkan dari token paling langka; bila
+        anggaran kandidat terlampaui, sisa list disampel merata sehingga biaya per pemilihan
+        tetap terbatas tanpa melewatkan penilaian.
+        """
+        corpus = self._corpus
+        context_is_crypto = not context_words.isdisjoint(CRYPTO_KEYWORDS)
+        postings_lists = sorted((corpus.index[t] for t in context_words if t in corpus.index), key=len)
+        candidates = set()
+        matching_total = 0  # Perkiraan atas jumlah pesan yang berbagi token dengan konteks
+        truncated = False
+        for position, postings in enumerate(postings_lists):
+            room = self.CANDIDATE_BUDGET - len(candidates)
+            if len(postings) <= room:
+                candidates.update(postings)
+                continue
+            truncated = True
+            remaining = postings_lists[position:]
+            share = max(1, min(room, self.CANDIDATE_SAMPLE) // len(remaining))
+            for rest in remaining:
+                candidates.update(random.sample(rest, min(share, len(rest))))
+            matching_total = len(candidates) + sum(len(rest) for rest in remaining)
+            break
+
+        high, low = [], []
+        crypto_candidates = 0
+        for i in candidates:
+            if self._used[i]: continue
+            score = self._similarity(corpus.token_sets[i], context_words, context_is_crypto)
+            if context_is_crypto and score <= self.CRYPTO_BONUS and not corpus.is_crypto[i]:
+                low.append((score, i))
+            else:
+                high.append((score, i))
+                crypto_candidates += corpus.is_crypto[i]
+        crypto_tier = 0
+        if context_is_crypto:
+            crypto_tier = len(corpus.crypto_indices) - self._used_crypto_count - crypto_candidates
+
+        top_count = max(1, available_count // 3)
+        if truncated and (high or low):
+            # Kandidat hanya sampel: ambil bagian teratas sampel yang sebanding dengan sepertiga teratas
+            scored = high + low
+            keep = max(1, -(-len(scored) * top_count // max(matching_total, top_count)))
+            return random.choice(heapq.nlargest(keep, scored))[1]
+        rank = random.randrange(top_count)
+        if rank < len(high):
+            if top_count < len(high):
+                high = heapq.nlargest(top_count, high)
+            return random.choice(high)[1]
+        rank -= len(high)
+        if rank < crypto_tier:
+            index = self._sample(corpus.crypto_indices, exclude=candidates)
+            if index is not None: return index
+        rank -= crypto_tier
+        if rank < len(low):
+            slots = top_count - len(high) - crypto_tier
+            if slots < len(low):
+                low = heapq.nlargest(slots, low)
+            return random.choice(low)[1]
+        return self._sample(range(len(corpus.messages)), exclude=candidates, skip_crypto=context_is_crypto)
     
     def get_smart_message(self, context: str = "") -> str | None:
+        self._refresh_corpus()
         if not self.all_messages: return None
-        available_messages = [msg for msg in self.all_messages if msg not in self.used_messages]
+        if self._used_count >= len(self.all_messages):
+            self._reset_used()
         
-        if not available_messages:
-            self.used_messages.clear()
-            available_messages = self.all_messages.copy()
-        
-        if not available_messages: return None
-        
-        if context:
-            scored_messages = sorted(
-                [(msg, self._calculate_context_similarity(msg, context)) for msg in available_messages],
-                key=lambda x: x[1], reverse=True
-            )
-            top_messages = scored_messages[:max(1, len(scored_messages) // 3)]
-            selected_message = random.choice(top_messages)[0]
+        all_indices = range(len(self.all_messages))
+        context_words = frozenset(context.lower().split()) if context else frozenset()
+        if context_words:
+            index = self._pick_for_context(context_words, len(self.all_messages) - self._used_count)
+            if index is None:
+                index = self._sample(all_indices)
         else:
-            selected_message = random.choice(available_messages)
-        
-        self.used_messages.add(selected_message)
-        return selected_message
+            index = self._sample(all_indices)
+
+        if index is None: return None
+        self._mark_used(index)
+        return self.all_messages[index]
     
     def get_stats(self) -> dict:
         total = len(self.all_messages)
-        used = len(self.used_messages)
+        used = self._used_count
         return {
             'total_messages': total, 'used_messages': used,
             'available_messages': total - used,
@@ -193,16 +1805,107 @@ class LocalMessageManager:
 
 class DiscordAccount:
     """Mewakili satu akun Discord (token) dan menangani interaksi API."""
-    def __init__(self, token: str):
+    MAX_BLOCKING_WAIT = 1.0
+
+    def __init__(self, token: str, http_settings: dict | None = None, identity: tuple | None = None):
         self.token = token
         self.headers = {"Authorization": self.token, "Content-Type": "application/json"}
         self.status = "offline"
         self.last_activity = None
-        self.user_id, self.username = self._get_bot_info()
+        self.http_settings = {**DEFAULT_HTTP_SETTINGS, **(http_settings or {})}
+        self.timeout = (self.http_settings["connect_timeout"], self.http_settings["read_timeout"])
+        self.connection_stats = ConnectionStats()
+        self.session = self._build_session()
+        self.rate_limiter = RateLimiter()
+        self.user_id, self.username = "Unknown", "Unknown"
+        if identity:
+            # Identitas dari auth cache: lewati validasi /users/@me
+            self.user_id, self.username = identity
+            self.status = "online"
+        else:
+            self.user_id, self.username = self._get_bot_info()
+        self.delete_queue = DeleteQueue(self)
+        if self.status == "online":
+            self.delete_queue.restore()
+
+    def _build_session(self) -> requests.Session:
+        """Membuat session keep-alive dengan pool koneksi dan kebijakan retry sendiri."""
+        retry = Retry(
+            total=self.http_settings["max_retries"],
+            backoff_factor=self.http_settings["backoff_factor"],
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "DELETE"}),
+            # 429 selalu diteruskan ke RateLimiter, bukan ditunggu diam-diam di dalam adapter
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        adapter = InstrumentedAdapter(
+            self.connection_stats, pool_connections=1,
+            pool_maxsize=self.http_settings["pool_maxsize"], max_retries=retry
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        self.delete_queue.stop()
+        self.session.close()
+
+    def update_http_settings(self, http_settings: dict | None):
+        """Membangun ulang session hanya bila pengaturan HTTP benar-benar berubah."""
+        merged = {**DEFAULT_HTTP_SETTINGS, **(http_settings or {})}
+        if merged == self.http_settings: return
+        self.http_settings = merged
+        self.timeout = (merged["connect_timeout"], merged["read_timeout"])
+        old_session, self.session = self.session, self._build_session()
+        old_session.close()
+
+    def _request(self, method: str, route: str, major: str, path: str, **kwargs) -> requests.Response:
+        """Mengirim request lewat rate limiter: menunggu slot bucket lebih dulu, retry 429 secara iteratif.
+
+        Di thread scheduler, tunggu lebih dari MAX_BLOCKING_WAIT detik tidak dijalankan dengan sleep:
+        RateLimitDeferred dilempar agar tugas pemanggil menjadwalkan ulang dirinya.
+        """
+        max_wait = self.http_settings["max_rate_limit_wait"]
+        attempts = self.http_settings["max_rate_limit_retries"] + 1
+        route_label = ROUTE_LABELS.get(route, route)
+        for _ in range(attempts):
+            if scheduler.on_worker_thread():
+                wait = self.rate_limiter.peek(route, major)
+                if wait > self.MAX_BLOCKING_WAIT:
+                    if wait > max_wait:
+                        raise RateLimitExceeded(f"{route} harus menunggu {wait:.1f} detik (batas {max_wait} detik)")
+                    self.rate_limiter.record_deferral()
+                    raise RateLimitDeferred(f"{route} ditunda {wait:.1f} detik", wait)
+            wait = self.rate_limiter.acquire(route, major)
+            if wait > max_wait:
+                raise RateLimitExceeded(f"{route} harus menunggu {wait:.1f} detik (batas {max_wait} detik)")
+            if wait > 0:
+                self.rate_limiter.record_wait(wait)
+                metrics.inc('discord_rate_limit_wait_seconds_total', wait, account=self.username)
+                time.sleep(wait)
+
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{DISCORD_API_BASE}{path}", timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                metrics.inc('discord_requests_total', account=self.username, route=route_label, status="error")
+                raise
+            metrics.observe('discord_request_duration_seconds', time.perf_counter() - start, account=self.username, route=route_label)
+            metrics.inc('discord_requests_total', account=self.username, route=route_label, status=str(response.status_code))
+            self.connection_stats.record_bytes(len(response.content))
+            retry_after = self.rate_limiter.update(route, major, response)
+            if retry_after is None:
+                return response
+            metrics.inc('discord_rate_limited_total', account=self.username, route=route_label)
+            log_message(f"Rate Limited [{self.username}]", f"{route} - menunggu {retry_after:.1f} detik...", "WAIT")
+        raise RateLimitExceeded(f"{route} masih terkena rate limit setelah {attempts} percobaan")
 
     def _get_bot_info(self) -> tuple[str, str]:
         try:
-            response = requests.get("https://discord.com/api/v9/users/@me", headers=self.headers, timeout=10)
+            response = self._request("GET", "GET /users/@me", "", "/users/@me")
             response.raise_for_status()
             data = response.json()
             user_id, username = data.get("id", "Unknown"), data.get("username", "Unknown")
@@ -220,101 +1923,441 @@ class DiscordAccount:
             payload["message_reference"] = {"message_id": reply_to_id}
 
         try:
-            response = requests.post(
-                f"https://discord.com/api/v9/channels/{channel_id}/messages",
-                json=payload, headers=self.headers, timeout=15
+            response = self._request(
+                "POST", "POST /channels/{channel_id}/messages", channel_id,
+                f"/channels/{channel_id}/messages", json=payload
             )
-            
-            if response.status_code == 429:
-                retry_after = response.json().get("retry_after", 1.0)
-                log_message(f"Rate Limited [{self.username}]", f"Menunggu {retry_after:.1f} detik...", "WAIT")
-                time.sleep(retry_after)
-                return self.send_message(channel_id, message, reply_to_id)
-            
             response.raise_for_status()
             self.last_activity = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             log_message(f"Pesan Terkirim [{self.username}]", f'"{message[:50]}..." ke #{channel_id}', "SUCCESS")
             return response.json()
             
+        except RateLimitDeferred:
+            raise
+        except RateLimitExceeded as e:
+            log_message(f"Gagal Kirim [{self.username}]", f"Rate limit: {str(e)}", "WARNING")
+            return None
         except requests.exceptions.RequestException as e:
             log_message(f"Gagal Kirim [{self.username}]", f"Error: {str(e)}", "ERROR")
             self.status = "error"
             return None
     
     def delete_message(self, channel_id: str, message_id: str) -> bool:
-        """Menghapus sebuah pesan di channel."""
+        """Menghapus sebuah pesan di channel. True jika pesan sudah tidak ada (terhapus atau 404)."""
         try:
-            response = requests.delete(
-                f"https://discord.com/api/v9/channels/{channel_id}/messages/{message_id}",
-                headers=self.headers,
-                timeout=10
+            response = self._request(
+                "DELETE", DELETE_ROUTE, channel_id,
+                f"/channels/{channel_id}/messages/{message_id}"
             )
-            
-            if response.status_code == 429: # Rate limit
-                retry_after = response.json().get("retry_after", 1.0)
-                log_message(f"Rate Limited (Delete) [{self.username}]", f"Menunggu {retry_after:.1f} detik...", "WAIT")
-                time.sleep(retry_after)
-                return self.delete_message(channel_id, message_id)
-
             response.raise_for_status()
             log_message(f"Pesan Dihapus [{self.username}]", f"Pesan {message_id} di channel {channel_id} berhasil dihapus.", "INFO")
             return True
+        except RateLimitDeferred:
+            raise
         except requests.exceptions.RequestException as e:
-            if e.response and e.response.status_code == 404:
+            if e.response is not None and e.response.status_code == 404:
                 log_message(f"Hapus Pesan Gagal [{self.username}]", f"Pesan {message_id} sudah tidak ada.", "WARNING")
-            else:
-                log_message(f"Hapus Pesan Gagal [{self.username}]", f"Error: {str(e)}", "ERROR")
+                return True
+            log_message(f"Hapus Pesan Gagal [{self.username}]", f"Error: {str(e)}", "ERROR")
+            return False
+
+    def bulk_delete_messages(self, channel_id: str, message_ids: list) -> bool:
+        """Menghapus 2-100 pesan (maks. 14 hari) sekaligus. Butuh izin Manage Messages di channel."""
+        try:
+            response = self._request(
+                "POST", BULK_DELETE_ROUTE, channel_id,
+                f"/channels/{channel_id}/messages/bulk-delete", json={'messages': message_ids}
+            )
+            response.raise_for_status()
+            log_message(f"Pesan Dihapus [{self.username}]", f"{len(message_ids)} pesan di channel {channel_id} dihapus (bulk).", "INFO")
+            return True
+        except RateLimitDeferred:
+            raise
+        except requests.exceptions.RequestException as e:
+            log_message(f"Bulk Delete Gagal [{self.username}]", f"Error: {str(e)}", "WARNING")
+            return False
+
+    def get_latest_messages(self, channel_id: str, limit: int = 10, after: str | None = None) -> list | None:
+        """Mengambil pesan terbaru; dengan `after` hanya pesan yang lebih baru dari id tersebut."""
+        params = {'limit': limit}
+        if after:
+            params['after'] = after
+        try:
+            response = self._request(
+                "GET", "GET /channels/{channel_id}/messages", channel_id,
+                f"/channels/{channel_id}/messages", params=params
+            )
+            response.raise_for_status()
+            return response.json()
+        except RateLimitDeferred:
+            raise
+        except requests.exceptions.RequestException as e:
+            log_message(f"Gagal Ambil Pesan [{self.username}]", f"Error: {str(e)}", "ERROR")
+            return None
+
+    def get_status_info(self) -> dict:
+        return {
+            'username': self.username, 'user_id': self.user_id,
+            'status': self.status, 'last_activity': self.last_activity,
+            'token_preview': f"...{self.token[-8:]}" if len(self.token) > 8 else "Invalid"
+        }
+
+    def get_stats(self) -> dict:
+        """Counter yang berubah di setiap request; disajikan terpisah dari status berversi."""
+        return {
+            'connection_stats': self.connection_stats.snapshot(),
+            'rate_limit': self.rate_limiter.snapshot(),
+            'delete_queue': self.delete_queue.get_stats()
+        }
+
+DELETE_ROUTE = "DELETE /channels/{channel_id}/messages/{message_id}"
+BULK_DELETE_ROUTE = "POST /channels/{channel_id}/messages/bulk-delete"
+ROUTE_LABELS = {
+    "GET /users/@me": "auth", "GET /channels/{channel_id}/messages": "fetch",
+    "POST /channels/{channel_id}/messages": "send", DELETE_ROUTE: "delete", BULK_DELETE_ROUTE: "bulk_delete"
+}
+DISCORD_EPOCH_MS = 1420070400000
+BULK_DELETE_MAX_AGE = 14 * 24 * 3600
+
+class DeleteQueue:
+    """Antrean hapus pesan latar per akun yang dijalankan scheduler.
+
+    Handler cukup memanggil `enqueue` lalu kembali. Setiap tick menghapus satu pesan (atau satu
+    batch bulk-delete); bila bucket DELETE/bulk-delete channel sedang habis, job menunda diri
+    sesuai waktu reset bucket alih-alih tidur di thread worker.
+    """
+    BULK_MAX = 100
+    RETRY_DELAY = 30
+    MAX_FAILURES = 3
+
+    def __init__(self, account: 'DiscordAccount'):
+        self.account = account
+        self._lock = threading.Lock()
+        self._channels = OrderedDict()  # channel_id -> {'ids': [...], 'bulk': bool}
+        self._failures = {}
+        self._job = None
+        self.deleted = 0
+        self.bulk_batches = 0
+        self.dropped = 0
+
+    def restore(self):
+        """Memuat id yang belum terhapus dari run sebelumnya lalu menjalankan antrean."""
+        pending = state_store.get('pending_deletes', token_digest(self.account.token), {})
+        if not pending: return
+        with self._lock:
+            for channel_id, entry in pending.items():
+                self._channels[channel_id] = {'ids': list(entry.get('ids', [])), 'bulk': entry.get('bulk', False)}
+            self._ensure_job()
+        count = sum(len(entry['ids']) for entry in self._channels.values())
+        log_message(f"Auto Delete [{self.account.username}]", f"Melanjutkan {count} pesan yang belum terhapus.", "INFO")
+
+    def enqueue(self, channel_id: str, message_ids: list, bulk: bool = False):
+        ids = [m for m in message_ids if m]
+        if not ids: return
+        with self._lock:
+            entry = self._channels.setdefault(channel_id, {'ids': [], 'bulk': bulk})
+            entry['bulk'] = bulk
+            entry['ids'].extend(ids)
+            self._persist()
+            self._ensure_job()
+
+    def stop(self):
+        with self._lock:
+            if self._job: scheduler.cancel(self._job)
+            self._job = None
+
+    def _ensure_job(self):
+        if self._job is None:
+            self._job = scheduler.schedule(0, self._tick, name=f"delete:{self.account.username}")
+
+    def _persist(self):
+        state_store.mark_dirty('pending_deletes', token_digest(self.account.token), self._snapshot)
+
+    def _snapshot(self) -> dict | None:
+        with self._lock:
+            pending = {
+                channel_id: {'ids': list(entry['ids']), 'bulk': entry['bulk']}
+                for channel_id, entry in self._channels.items() if entry['ids']
+            }
+        return pending or None
+
+    @staticmethod
+    def _bulk_eligible(message_id: str, now: float) -> bool:
+        """Bulk-delete Discord hanya menerima pesan yang lebih muda dari 14 hari."""
+        try:
+            created = ((int(message_id) >> 22) + DISCORD_EPOCH_MS) / 1000
+        except ValueError:
             return False
+        return now - created < BULK_DELETE_MAX_AGE - 60
+
+    def _next_batch(self) -> tuple | None:
+        """Memilih pekerjaan berikutnya: (channel_id, ids, route) atau None bila antrean kosong."""
+        for channel_id, entry in list(self._channels.items()):
+            if not entry['ids']:
+                del self._channels[channel_id]
+                continue
+            if entry['bulk']:
+                now = time.time()
+                eligible = [m for m in entry['ids'] if self._bulk_eligible(m, now)][:self.BULK_MAX]
+                if len(eligible) >= 2:
+                    return channel_id, eligible, BULK_DELETE_ROUTE
+            return channel_id, entry['ids'][:1], DELETE_ROUTE
+        return None
+
+    def _complete(self, channel_id: str, message_ids: list):
+        with self._lock:
+            entry = self._channels.get(channel_id)
+            if entry:
+                done = set(message_ids)
+                entry['ids'] = [m for m in entry['ids'] if m not in done]
+                if not entry['ids']:
+                    del self._channels[channel_id]
+            for message_id in message_ids:
+                self._failures.pop(message_id, None)
+            self._persist()
 
-    def get_latest_messages(self, channel_id: str, limit: int = 10) -> list | None:
+    def _tick(self) -> float | None:
+        with self._lock:
+            batch = self._next_batch()
+            if batch is None:
+                self._job = None
+                return None
+        channel_id, message_ids, route = batch
+        wait = self.account.rate_limiter.peek(route, channel_id)
+        if wait > 0:
+            return wait
         try:
-            response = requests.get(
-                f'https://discord.com/api/v9/channels/{channel_id}/messages?limit={limit}',
-                headers=self.headers, timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            log_message(f"Gagal Ambil Pesan [{self.username}]", f"Error: {str(e)}", "ERROR")
-            return None
+            return self._run_batch(channel_id, message_ids, route)
+        except RateLimitDeferred as e:
+            return e.retry_after
 
-    def get_status_info(self) -> dict:
+    def _run_batch(self, channel_id: str, message_ids: list, route: str) -> float:
+        if route == BULK_DELETE_ROUTE:
+            if self.account.bulk_delete_messages(channel_id, message_ids):
+                self.bulk_batches += 1
+                self.deleted += len(message_ids)
+                self._complete(channel_id, message_ids)
+            else:
+                # Akun tidak bisa bulk-delete di channel ini: lanjut satu per satu
+                with self._lock:
+                    entry = self._channels.get(channel_id)
+                    if entry: entry['bulk'] = False
+            return 0
+
+        message_id = message_ids[0]
+        if self.account.delete_message(channel_id, message_id):
+            self.deleted += 1
+            self._complete(channel_id, message_ids)
+            return 0
+        failures = self._failures.get(message_id, 0) + 1
+        self._failures[message_id] = failures
+        if failures >= self.MAX_FAILURES:
+            self.dropped += 1
+            self._complete(channel_id, message_ids)
+            return 0
+        with self._lock:
+            # Pindahkan channel ke belakang agar channel lain tetap jalan selama menunggu
+            if channel_id in self._channels:
+                self._channels.move_to_end(channel_id)
+        return self.RETRY_DELAY
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            pending = sum(len(entry['ids']) for entry in self._channels.values())
+        return {'pending': pending, 'deleted': self.deleted, 'bulk_batches': self.bulk_batches, 'dropped': self.dropped}
+
+class ChannelFeed:
+    """Cache pesan per channel yang dipakai bersama oleh semua handler dan akun.
+
+    Fetch pertama mengambil jendela pesan terbaru; fetch berikutnya hanya meminta pesan
+    setelah cursor (`after=`). Selama hasil masih lebih muda dari `max_age`, pemanggil lain
+    memakai hasil yang sama tanpa request baru.
+    """
+    WINDOW = 5
+    AFTER_LIMIT = 100
+    FULL_REFRESH_SECONDS = 300
+
+    def __init__(self, channel_id: str):
+        self.channel_id = channel_id
+        self._lock = threading.Lock()
+        self._messages = []
+        self._cursor = None
+        self._fetched_at = 0.0
+        self._full_refresh_at = 0.0
+        self.fetch_count = 0
+        self.cache_hits = 0
+        self.messages_fetched = 0
+
+    def get_messages(self, account: 'DiscordAccount', max_age: float) -> list | None:
+        """Mengembalikan jendela pesan terbaru (terbaru dulu), fetch hanya jika cache kedaluwarsa."""
+        with self._lock:
+            now = time.monotonic()
+            if self._fetched_at and now - self._fetched_at < max_age:
+                self.cache_hits += 1
+                return list(self._messages)
+
+            full_refresh = self._cursor is None or now >= self._full_refresh_at
+            if full_refresh:
+                fetched = account.get_latest_messages(self.channel_id, limit=self.WINDOW)
+            else:
+                fetched = account.get_latest_messages(self.channel_id, limit=self.AFTER_LIMIT, after=self._cursor)
+                if fetched is not None and len(fetched) >= self.AFTER_LIMIT:
+                    # Terlalu banyak pesan baru sejak cursor: ambil ulang jendela terbaru
+                    full_refresh = True
+                    fetched = account.get_latest_messages(self.channel_id, limit=self.WINDOW)
+            if fetched is None:
+                return None
+
+            self.fetch_count += 1
+            self.messages_fetched += len(fetched)
+            if full_refresh:
+                merged = fetched
+                self._full_refresh_at = now + self.FULL_REFRESH_SECONDS
+            else:
+                known_ids = {m.get('id') for m in fetched}
+                merged = fetched + [m for m in self._messages if m.get('id') not in known_ids]
+            merged.sort(key=lambda m: int(m.get('id', 0)), reverse=True)
+            self._messages = merged[:self.WINDOW]
+            if self._messages:
+                self._cursor = self._messages[0].get('id')
+            self._fetched_at = now
+            return list(self._messages)
+
+    def get_stats(self) -> dict:
         return {
-            'username': self.username, 'user_id': self.user_id,
-            'status': self.status, 'last_activity': self.last_activity,
-            'token_preview': f"...{self.token[-8:]}" if len(self.token) > 8 else "Invalid"
+            'fetch_count': self.fetch_count, 'cache_hits': self.cache_hits,
+            'messages_fetched': self.messages_fetched, 'cursor': self._cursor
         }
 
+channel_feeds = {}
+channel_feeds_lock = threading.Lock()
+
+def get_channel_feed(channel_id: str) -> ChannelFeed:
+    with channel_feeds_lock:
+        feed = channel_feeds.get(channel_id)
+        if feed is None:
+            feed = channel_feeds[channel_id] = ChannelFeed(channel_id)
+        return feed
+
+class ProcessedIdStore:
+    """Penyimpan id pesan yang sudah diproses dengan memori tetap.
+
+    Snowflake Discord selalu naik, jadi cukup menyimpan ring buffer id terakhir plus
+    high-water mark dari id yang sudah terbuang: id yang tidak lebih baru dari batas itu
+    dianggap sudah diproses.
+    """
+    def __init__(self, window: int = 256, state_key: str | None = None):
+        self._window = deque(maxlen=window)
+        self._members = set()
+        self._floor = 0
+        self.total_processed = 0
+        self.state_key = state_key
+        if state_key:
+            saved = state_store.get('processed_ids', state_key)
+            if saved:
+                self._window.extend(saved['window'])
+                self._members.update(self._window)
+                self._floor = saved['floor']
+                self.total_processed = saved['total']
+
+    def _snapshot(self) -> dict:
+        return {'window': list(self._window), 'floor': self._floor, 'total': self.total_processed}
+
+    @staticmethod
+    def _snowflake(msg_id) -> int:
+        try:
+            return int(msg_id)
+        except (TypeError, ValueError):
+            return 0
+
+    def __contains__(self, msg_id) -> bool:
+        snowflake = self._snowflake(msg_id)
+        return snowflake <= self._floor or snowflake in self._members
+
+    def __len__(self) -> int:
+        return self.total_processed
+
+    def add(self, msg_id):
+        snowflake = self._snowflake(msg_id)
+        if snowflake in self: return
+        if len(self._window) == self._window.maxlen:
+            evicted = self._window[0]
+            self._members.discard(evicted)
+            self._floor = max(self._floor, evicted)
+        self._window.append(snowflake)
+        self._members.add(snowflake)
+        self.total_processed += 1
+        if self.state_key:
+            state_store.mark_dirty('processed_ids', self.state_key, self._snapshot)
+
+processed_id_stores = {}
+
+def get_processed_id_store(state_key: str) -> ProcessedIdStore:
+    """Store per handler (token:channel) bertahan melewati initialize_bot() dan restart agar dedupe tidak hilang."""
+    store = processed_id_stores.get(state_key)
+    if store is None:
+        store = processed_id_stores[state_key] = ProcessedIdStore(state_key=state_key)
+    return store
+
 class ChannelHandler:
     """Mengelola logika untuk satu channel spesifik."""
     def __init__(self, channel_id: str, settings: dict, account: DiscordAccount):
         self.channel_id = channel_id
         self.settings = settings
         self.account = account
-        self.processed_ids = set()
-        self.message_manager = LocalMessageManager()
+        self.feed = get_channel_feed(channel_id)
+        self.state_key = f"{token_digest(account.token)[:16]}:{channel_id}"
+        self.trace_label = f"{account.username}:{channel_id}"
+        self.processed_ids = get_processed_id_store(self.state_key)
+        self.message_manager = LocalMessageManager(state_key=self.state_key)
         self.is_running = False
-        self.thread = None
+        self._poll_job = None
+        self._poll_due = 0.0
+        self._polled_once = False
+        self._chatter_job = None
+        self._reply_generation = 0
         # --- LOGIKA BARU UNTUK AUTO-DELETE ---
-        self.sent_message_ids = []
+        self.sent_message_ids = state_store.get('sent_message_ids', self.state_key, [])
         self.auto_delete_enabled = self.settings.get("enable_auto_delete", False)
         self.delete_threshold = self.settings.get("delete_after_messages", 5)
 
-    def start(self):
+    def start(self, start_delay: float = 0.0):
+        """Mulai polling; `start_delay` menggeser poll pertama agar handler tidak poll bersamaan."""
         if self.is_running: return
         self.is_running = True
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
+        self._schedule_poll(start_delay + self.settings.get("delay_interval", 15))
         
         if self.settings.get("enable_local_chatter", False):
-            self._start_local_chatter()
+            self._chatter_job = scheduler.schedule(self._next_chatter_delay(), self._chatter_tick, name=f"chatter:{self.channel_id}")
         
         log_message(f"Handler Started", f"Channel: {self.channel_id} | Account: {self.account.username}", "SUCCESS")
 
+    def update_settings(self, settings: dict):
+        """Menerapkan pengaturan baru tanpa restart; state (processed ids, pesan terkirim) tetap."""
+        old_settings, self.settings = self.settings, settings
+        self.auto_delete_enabled = settings.get("enable_auto_delete", False)
+        self.delete_threshold = settings.get("delete_after_messages", 5)
+        if not self.is_running: return
+
+        def changed(*keys):
+            return any(old_settings.get(k) != settings.get(k) for k in keys)
+
+        if changed("delay_interval"):
+            scheduler.cancel(self._poll_job)
+            self._schedule_poll(settings.get("delay_interval", 15))
+        if changed("enable_local_chatter", "local_chatter_delay_min", "local_chatter_delay_max"):
+            if self._chatter_job:
+                scheduler.cancel(self._chatter_job)
+                self._chatter_job = None
+            if settings.get("enable_local_chatter", False):
+                self._chatter_job = scheduler.schedule(self._next_chatter_delay(), self._chatter_tick, name=f"chatter:{self.channel_id}")
+
     def stop(self):
         self.is_running = False
+        for job in (self._poll_job, self._chatter_job):
+            if job: scheduler.cancel(job)
+        self._poll_job = self._chatter_job = None
         log_message(f"Handler Stopped", f"Channel: {self.channel_id} | Account: {self.account.username}", "WARNING")
-    
   
     def _handle_auto_delete(self, sent_message: dict):
         """Menangani logika penghapusan pesan otomatis."""
@@ -322,83 +2365,140 @@ class ChannelHandler:
             return
 
         self.sent_message_ids.append(sent_message.get('id'))
+        state_store.mark_dirty('sent_message_ids', self.state_key, lambda: list(self.sent_message_ids) or None)
         
         if len(self.sent_message_ids) >= self.delete_threshold:
-            log_message(f"Auto Delete [{self.account.username}]", f"Batas {self.delete_threshold} pesan tercapai. Menghapus pesan...", "INFO")
+            log_message(f"Auto Delete [{self.account.username}]", f"Batas {self.delete_threshold} pesan tercapai. Menjadwalkan penghapusan...", "INFO")
             ids_to_delete = self.sent_message_ids.copy()
             self.sent_message_ids.clear()
+            self.account.delete_queue.enqueue(
+                self.channel_id, ids_to_delete, bulk=self.settings.get("auto_delete_bulk", False)
+            )
 
-            for msg_id in ids_to_delete:
-                if msg_id:
-                    self.account.delete_message(self.channel_id, msg_id)
-                    time.sleep(1) 
+    def _next_chatter_delay(self) -> int:
+        min_delay = self.settings.get("local_chatter_delay_min", 2700)
+        max_delay = self.settings.get("local_chatter_delay_max", 5400)
+        if min_delay > max_delay: min_delay = max_delay -1
+        return random.randint(min_delay, max_delay)
 
-    def _start_local_chatter(self):
-        def chatter_loop():
-            while self.is_running:
-                try:
-                    min_delay = self.settings.get("local_chatter_delay_min", 2700)
-                    max_delay = self.settings.get("local_chatter_delay_max", 5400)
-                    if min_delay > max_delay: min_delay = max_delay -1
-                    delay = random.randint(min_delay, max_delay)
-                    
-                    for _ in range(delay):
-                        if not self.is_running: return
-                        time.sleep(1)
-                    
-                    context_messages = self.account.get_latest_messages(self.channel_id, limit=5)
-                    if context_messages:
+    def _chatter_tick(self) -> float | None:
+        """Satu putaran local chatter; dijalankan oleh scheduler."""
+        if not self.is_running: return None
+        try:
+            with tracer.span('chatter', self.trace_label):
+                with tracer.span('fetch'):
+                    context_messages = self._fetch_messages()
+                if context_messages:
+                    with tracer.span('clean_mentions'):
                         context = " ".join([clean_discord_mentions(m.get('content', '')) for m in context_messages[:3]])
+                    with tracer.span('smart_message'):
                         message = self.message_manager.get_smart_message(context)
-                        if message: 
+                    if message: 
+                        with tracer.span('send'):
                             sent_message = self.account.send_message(self.channel_id, message)
-                            self._handle_auto_delete(sent_message)
-                            
-                except Exception as e:
-                    log_message(f"Chatter Error [{self.account.username}]", str(e), "ERROR")
-                    time.sleep(60)
+                        self._handle_auto_delete(sent_message)
+        except RateLimitDeferred as e:
+            return e.retry_after
+        except Exception as e:
+            log_message(f"Chatter Error [{self.account.username}]", str(e), "ERROR")
+            return 60 + self._next_chatter_delay()
+        return self._next_chatter_delay()
 
-        threading.Thread(target=chatter_loop, daemon=True).start()
+    def _schedule_poll(self, delay: float):
+        self._poll_due = time.monotonic() + delay
+        self._poll_job = scheduler.schedule(delay, self._poll_tick, name=f"poll:{self.channel_id}")
 
-    def _run_loop(self):
+    def _poll_tick(self) -> float | None:
+        """Satu putaran polling channel; dijalankan oleh scheduler setiap delay_interval."""
         delay_interval = self.settings.get("delay_interval", 15)
-        while self.is_running:
-            try:
-                time.sleep(delay_interval)
-                messages = self.account.get_latest_messages(self.channel_id, limit=5)
-                if not messages: continue
+        if not self.is_running: return None
+        metrics.observe('poll_lag_seconds', max(0.0, time.monotonic() - self._poll_due), account=self.account.username)
+        try:
+            with tracer.span('poll', self.trace_label):
+                self._poll_once()
+            next_delay = delay_interval
+        except RateLimitDeferred as e:
+            next_delay = e.retry_after
+        except Exception as e:
+            log_message(f"Loop Error [{self.account.username}]", str(e), "ERROR")
+            next_delay = 30 + delay_interval
+        if not self._polled_once:
+            self._polled_once = True
+            record_first_poll()
+        self._poll_due = time.monotonic() + next_delay
+        return next_delay
 
-                last_message = messages[0]
-                msg_id, author_id = last_message.get('id'), last_message.get('author', {}).get('id')
+    def _fetch_messages(self) -> list | None:
+        return self.feed.get_messages(self.account, self.settings.get("fetch_cache_ttl", 5))
 
-                if author_id == self.account.user_id or msg_id in self.processed_ids:
-                    continue
-                self.processed_ids.add(msg_id)
-                
-                is_mentioned = any(m['id'] == self.account.user_id for m in last_message.get('mentions', []))
-                reply_mode = self.settings.get("reply_mode", "mention")
-                
-                if not ((reply_mode == "mention" and is_mentioned) or reply_mode == "all"):
-                    continue
+    def _poll_once(self):
+        with tracer.span('fetch'):
+            messages = self._fetch_messages()
+        if not messages: return
 
-                content = clean_discord_mentions(last_message.get("content", ""))
-                if not content: continue
-                self._generate_and_send_reply(messages, last_message, content)
-                
-            except Exception as e:
-                log_message(f"Loop Error [{self.account.username}]", str(e), "ERROR")
-                time.sleep(30)
-
-    def _generate_and_send_reply(self, messages, last_message, content):
-        api_key = get_api_key(
-            global_config.get("used_api_keys", set()),
-            global_config.get("google_api_keys", []),
-            global_config.get("cooldown_seconds", 86400)
-        )
-        if not api_key:
-            log_message("API Key", "Tidak ada API key yang tersedia.", "WARNING")
+        last_message = messages[0]
+        msg_id, author_id = last_message.get('id'), last_message.get('author', {}).get('id')
+
+        if author_id == self.account.user_id or msg_id in self.processed_ids:
+            return
+        self.processed_ids.add(msg_id)
+        
+        is_mentioned = any(m['id'] == self.account.user_id for m in last_message.get('mentions', []))
+        reply_mode = self.settings.get("reply_mode", "mention")
+        
+        if not ((reply_mode == "mention" and is_mentioned) or reply_mode == "all"):
             return
 
+        with tracer.span('clean_mentions'):
+            content = clean_discord_mentions(last_message.get("content", ""))
+        if not content: return
+        self._reply_generation += 1
+        with tracer.span('submit'):
+            submitted = reply_workers.submit(self, self._reply_generation, (messages, last_message, content))
+        if not submitted:
+            log_message(f"Reply Dilewati [{self.account.username}]", "Antrean balasan AI penuh.", "WARNING")
+
+    def is_reply_current(self, generation: int) -> bool:
+        """Job balasan masih relevan bila handler berjalan dan belum ada balasan lebih baru yang diantrekan."""
+        return self.is_running and generation == self._reply_generation
+
+    def _generate_and_send_reply(self, messages, last_message, content, generation: int):
+        """Dijalankan oleh reply worker: membuat respons AI lalu menjadwalkan pengiriman."""
+        with tracer.span('reply', self.trace_label):
+            self._generate_reply(messages, last_message, content, generation)
+
+    def _generate_reply(self, messages, last_message, content, generation: int):
+        with tracer.span('cache'):
+            conversation = [clean_discord_mentions(m.get('content', '')) for m in reversed(messages[:3])]
+            cache_key = response_cache.make_key(conversation)
+            ai_response = response_cache.get(cache_key)
+        if ai_response:
+            log_message("Reply Cache", f"Memakai respons tersimpan untuk: \"{content[:50]}...\"", "INFO")
+        else:
+            with tracer.span('gemini'):
+                ai_response = self._request_ai_response(messages, content)
+            if ai_response:
+                response_cache.put(cache_key, ai_response)
+        
+        if ai_response:
+            reply_to = last_message.get('id') if self.settings.get("use_reply", True) else None
+            scheduler.schedule(
+                random.randint(2, 5), lambda: self._send_reply(ai_response, reply_to, generation),
+                name=f"reply:{self.channel_id}"
+            )
+        else:
+            log_message("Reply Failed", "Gagal mendapatkan respons dari AI.", "WARNING")
+
+    def _request_ai_response(self, messages, content) -> str | None:
+        api_key, retry_at = api_key_pool.acquire()
+        if not api_key:
+            if retry_at:
+                retry_time = datetime.fromtimestamp(retry_at).strftime('%Y-%m-%d %H:%M:%S')
+                log_message("API Key", f"Semua API key sedang cooldown. Tersedia lagi {retry_time}.", "WAIT")
+            else:
+                log_message("API Key", "Tidak ada API key yang tersedia.", "WARNING")
+            return None
+
         conversation_history = "\n".join(
             [f"- {m.get('author', {}).get('username', 'User')}: {clean_discord_mentions(m.get('content', ''))}" for m in reversed(messages[:3])]
         )
@@ -414,60 +2514,236 @@ Here is a brief history of the conversation:
 Give a relevant response to the last message. Do not repeat the question.
 """
         log_message("Generating Reply", f"Membuat respons untuk: \"{content[:50]}...\"", "INFO")
-        ai_response = generate_gemini_response(api_key, prompt)
-        
-        if ai_response:
-            time.sleep(random.randint(2, 5))
-            reply_to = last_message.get('id') if self.settings.get("use_reply", True) else None
-            sent_message = self.account.send_message(self.channel_id, ai_response, reply_to)
-            self._handle_auto_delete(sent_message)
-        else:
-            log_message("Reply Failed", "Gagal mendapatkan respons dari AI.", "WARNING")
+        return generate_gemini_response(api_key, prompt)
+
+    def _send_reply(self, ai_response: str, reply_to: str | None, generation: int):
+        if not self.is_reply_current(generation):
+            reply_workers.record_coalesced()
+            return None
+        try:
+            with tracer.span('send_reply', self.trace_label):
+                sent_message = self.account.send_message(self.channel_id, ai_response, reply_to)
+                self._handle_auto_delete(sent_message)
+        except RateLimitDeferred as e:
+            # Dijadwalkan ulang oleh scheduler; generasi dicek lagi saat itu
+            return e.retry_after
+        return None
 
     def get_status_info(self) -> dict:
         return {
             'channel_id': self.channel_id, 'is_running': self.is_running,
-            'processed_count': len(self.processed_ids),
+            'processed_count': len(self.processed_ids)
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            'feed_stats': self.feed.get_stats(),
             'message_stats': self.message_manager.get_stats()
         }
 
-# --- Flask Routes ---
-@app.route('/')
-def index():
-    return render_template('index.html')
+# --- Status Tracking ---
+def build_status_snapshot() -> dict:
+    """Status berversi: hanya field yang jarang berubah (status akun, last_activity, processed count, flag running).
 
-@app.route('/api/status')
-def get_status():
+    Counter yang naik di setiap poll ada di build_status_stats agar versi dan ETag tetap stabil.
+    """
     accounts_status = {token: acc.get_status_info() for token, acc in bot_accounts.items()}
     channels_status = {key: h.get_status_info() for key, h in channel_handlers.items()}
     
-    return jsonify({
+    snapshot = {
         'accounts': accounts_status, 'channels': channels_status,
         'total_accounts': len(bot_accounts),
         'active_channels': sum(1 for h in channel_handlers.values() if h.is_running),
-        'total_logs': len(system_logs)
-    })
+        # Salinan, bukan referensi: snapshot lama harus tetap bisa dibandingkan saat membuat patch
+        'startup': copy.deepcopy(startup_metrics)
+    }
+    if supervisor is not None:
+        supervisor.merge_status(snapshot)
+    return snapshot
+
+def build_status_stats() -> dict:
+    """Counter runtime yang cepat berubah; disajikan lewat /api/status/stats tanpa versi."""
+    stats = {
+        'accounts': {token: acc.get_stats() for token, acc in bot_accounts.items()},
+        'channels': {key: h.get_stats() for key, h in channel_handlers.items()},
+        'total_logs': len(system_logs),
+        'log_pipeline': log_pipeline.get_stats(),
+        'log_broadcaster': log_broadcaster.get_stats(),
+        'api_keys': api_key_pool.get_stats(),
+        'reply_workers': reply_workers.get_stats(),
+        'response_cache': response_cache.get_stats(),
+        'state_store': state_store.get_stats(),
+        'log_history': log_history.get_stats(),
+        'config': config_service.get_stats()
+    }
+    if supervisor is not None:
+        supervisor.merge_stats(stats)
+    return stats
+
+def _merge_patch(old: dict, new: dict) -> dict:
+    """Membuat JSON Merge Patch (RFC 7396) dari `old` ke `new`; kunci yang hilang bernilai None."""
+    patch = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = _merge_patch(previous, value)
+            if nested: patch[key] = nested
+        elif key not in old or previous != value:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+class StatusTracker:
+    """Snapshot status berversi yang dipakai bersama oleh /api/status (ETag) dan push delta Socket.IO.
+
+    Snapshot dibangun paling sering sekali per `max_age` detik berapa pun jumlah tab yang
+    terbuka. Setiap kali isinya berubah, versi naik dan hanya field yang berubah dikirim
+    ke klien sebagai event `status_delta`. Counter runtime di-cache terpisah per `stats_max_age`.
+    """
+    def __init__(self, max_age: float = 1.0, push_interval: float = 2.0, stats_max_age: float = 5.0):
+        self.max_age = max_age
+        self.push_interval = push_interval
+        self.stats_max_age = stats_max_age
+        self._stats = {}
+        self._stats_built_at = float('-inf')
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._snapshot = {}
+        self._version = 0
+        self._built_at = float('-inf')
+        self._push_job = None
+
+    def current(self) -> tuple[dict, int]:
+        with self._lock:
+            if time.monotonic() - self._built_at >= self.max_age:
+                self._rebuild()
+            return self._snapshot, self._version
+
+    def _rebuild(self):
+        snapshot = build_status_snapshot()
+        self._built_at = time.monotonic()
+        patch = _merge_patch(self._snapshot, snapshot)
+        if not patch and self._version: return
+        base_version = self._version
+        self._snapshot = snapshot
+        self._version += 1
+        if log_broadcaster.client_count():
+            socketio.emit('status_delta', {
+                'base_version': base_version, 'version': self._version, 'patch': patch
+            })
+
+    def stats(self) -> dict:
+        with self._lock:
+            if time.monotonic() - self._stats_built_at >= self.stats_max_age:
+                self._stats = build_status_stats()
+                self._stats_built_at = time.monotonic()
+            return self._stats
+
+    def ensure_push(self):
+        """Menjadwalkan push delta berkala selama ada klien panel yang terhubung."""
+        with self._lock:
+            if self._push_job is None:
+                self._push_job = scheduler.schedule(self.push_interval, self._push_tick, name="status-push")
+
+    def _push_tick(self) -> float | None:
+        with self._lock:
+            if not log_broadcaster.client_count():
+                self._push_job = None
+                return None
+        self.current()
+        return self.push_interval
+
+status_tracker = StatusTracker()
+
+# --- Flask Routes ---
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+@app.route('/api/status')
+def get_status():
+    snapshot, version = status_tracker.current()
+    response = jsonify({**snapshot, 'version': version})
+    response.set_etag(f"{status_tracker.boot_id}-{version}", weak=True)
+    return response.make_conditional(request)
+
+@app.route('/api/status/stats')
+def get_status_stats():
+    return jsonify(status_tracker.stats())
+
+def collect_runtime_gauges() -> list:
+    """Gauge yang dibaca langsung dari state saat /metrics di-scrape."""
+    log_stats = log_pipeline.get_stats()
+    reply_stats = reply_workers.get_stats()
+    accounts = list(bot_accounts.values())
+    gauges = [
+        ('process_threads', 'Jumlah thread hidup di proses.', [({}, threading.active_count())]),
+        ('scheduler_pending_jobs', 'Tugas terjadwal yang menunggu di scheduler.', [({}, scheduler.pending_count())]),
+        ('channel_handlers_running', 'Handler channel yang sedang berjalan.',
+         [({}, sum(1 for h in list(channel_handlers.values()) if h.is_running))]),
+        ('reply_queue_depth', 'Job balasan AI yang menunggu worker.', [({}, reply_stats['queue_depth'])]),
+        ('reply_in_progress', 'Job balasan AI yang sedang dikerjakan.', [({}, reply_stats['in_progress'])]),
+        ('log_queue_depth', 'Entri log yang menunggu ditulis.', [({}, log_stats['queue_depth'])]),
+        ('delete_queue_pending', 'Pesan yang menunggu dihapus per akun.',
+         [({'account': a.username}, a.delete_queue.get_stats()['pending']) for a in accounts]),
+    ]
+    if startup_metrics['cold_start_seconds'] is not None:
+        gauges.append(('cold_start_seconds', 'Waktu dari start proses sampai System Ready.', [({}, startup_metrics['cold_start_seconds'])]))
+    return gauges
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(collect_runtime_gauges()), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/logs')
 def get_logs():
     limit = request.args.get('limit', 100, type=int)
-    return jsonify(system_logs[-limit:])
+    return jsonify(list(system_logs)[-limit:])
+
+def _parse_log_time(value: str | None) -> float | None:
+    """Menerima epoch detik atau waktu ISO ("2024-01-31 13:00:00")."""
+    if not value: return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/logs/history')
+def get_log_history():
+    """Riwayat log dari disk dengan cursor pagination dan filter waktu/level/judul/akun."""
+    try:
+        levels = [level for level in request.args.get('level', '').split(',') if level and level != 'all']
+        entries, next_cursor = log_history.query(
+            cursor=request.args.get('cursor') or None,
+            limit=max(1, min(request.args.get('limit', 100, type=int), 1000)),
+            since=_parse_log_time(request.args.get('since')),
+            until=_parse_log_time(request.args.get('until')),
+            levels=levels or None,
+            title=request.args.get('title') or None,
+            account=request.args.get('account') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': f"Parameter tidak valid: {str(e)}"}), 400
+    return jsonify({'entries': entries, 'next_cursor': next_cursor})
 
 @app.route('/api/config', methods=['GET', 'POST'])
 def handle_config():
     if request.method == 'POST':
         try:
-            with open('config.json', 'w') as f:
-                json.dump(request.json, f, indent=4)
+            config_service.save(request.json)
             log_message("Config Updated", "Configuration updated via web panel", "INFO")
             return jsonify({'success': True})
+        except ConfigError as e:
+            log_message("Config Error", str(e), "ERROR")
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             log_message("Config Error", str(e), "ERROR")
             return jsonify({'error': str(e)}), 500
     else: # GET
         try:
-            with open('config.json', 'r') as f:
-                return jsonify(json.load(f))
+            return jsonify(config_service.get())
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
@@ -476,8 +2752,10 @@ def handle_messages():
     if request.method == 'POST':
         try:
             messages = request.json.get('messages', [])
-            with open('pesan.txt', 'w', encoding='utf-8') as f:
+            with open('pesan.txt.tmp', 'w', encoding='utf-8') as f:
                 f.write('\n'.join(m.strip() for m in messages))
+            os.replace('pesan.txt.tmp', 'pesan.txt')
+            invalidate_message_corpus('pesan.txt')
             log_message("Messages Updated", f"Updated {len(messages)} messages via web panel", "INFO")
             return jsonify({'success': True})
         except Exception as e:
@@ -502,34 +2780,21 @@ def add_account():
         if not new_token or not new_channel_id:
             return jsonify({'error': 'Token and Channel ID are required'}), 400
 
-        with open('config.json', 'r+') as f:
-            config = json.load(f)
-            
-            token_exists = False
+        def add_to_config(config: dict):
             for acc in config.get('accounts', []):
                 if acc.get('token') == new_token:
                     if new_channel_id not in acc.get('channels', []):
-                        acc['channels'].append(new_channel_id)
-                    token_exists = True
-                    break
-            
-            if not token_exists:
-                config.setdefault('accounts', []).append({
-                    "token": new_token,
-                    "channels": [new_channel_id]
-                })
+                        acc.setdefault('channels', []).append(new_channel_id)
+                    return
+            config.setdefault('accounts', []).append({
+                "token": new_token,
+                "channels": [new_channel_id]
+            })
 
-            f.seek(0)
-            json.dump(config, f, indent=4)
-            f.truncate()
+        log_message("Account Added", "Akun/Channel baru ditambahkan via panel. Menerapkan config...", "INFO")
+        config_service.update(add_to_config)
         
-        log_message("Account Added", "Akun/Channel baru ditambahkan via panel. Merestart bot...", "INFO")
-        
-        stop_all_handlers()
-        time.sleep(1)
-        initialize_bot()
-        
-        return jsonify({'success': True, 'message': 'Account added and bot restarted.'})
+        return jsonify({'success': True, 'message': 'Account added and applied.'})
         
     except Exception as e:
         log_message("Add Account Error", str(e), "ERROR")
@@ -538,97 +2803,723 @@ def add_account():
 @app.route('/api/restart')
 def restart_bot():
     try:
-        stop_all_handlers()
-        time.sleep(2)
-        initialize_bot()
+        if request.args.get('full', 'false').lower() == 'true':
+            full_restart()
+        else:
+            initialize_bot()
         return jsonify({'success': True})
     except Exception as e:
         log_message("Restart Error", str(e), "ERROR")
         return jsonify({'error': str(e)}), 500
 
+def set_tracing(enabled: bool, reset: bool = False):
+    """Mengaktifkan/menonaktifkan timing span di proses ini dan di semua shard."""
+    if reset: tracer.reset()
+    tracer.set_enabled(enabled)
+    if supervisor is not None:
+        supervisor.broadcast('tracing', enabled, reset)
+
+def control_profiler(action: str, duration: float = 30.0, interval: float = 0.01) -> bool:
+    """Memulai atau menghentikan sampling profiler di proses ini dan di semua shard."""
+    started = True
+    if action == 'start':
+        started = profiler.start(duration, interval)
+    else:
+        profiler.stop()
+    if supervisor is not None:
+        supervisor.broadcast('profiler', action, duration, interval)
+    return started
+
+def instrumentation_report(include_folded: bool = False) -> dict:
+    report = {
+        'tracing': {**tracer.get_stats(), 'spans': tracer.summary()},
+        'profiler': profiler.get_stats()
+    }
+    if include_folded:
+        report['tracing']['folded'] = tracer.folded()
+        report['profiler']['folded'] = profiler.folded()
+    return report
+
+@app.route('/api/instrumentation')
+def get_instrumentation():
+    report = instrumentation_report()
+    if supervisor is not None:
+        report['shards'] = supervisor.collect_instrumentation(include_folded=False)
+    return jsonify(report)
+
+@app.route('/api/instrumentation/tracing', methods=['POST'])
+def handle_tracing():
+    data = request.json or {}
+    set_tracing(bool(data.get('enabled')), bool(data.get('reset', False)))
+    log_message("Instrumentation", f"Timing span {'diaktifkan' if tracer.enabled else 'dinonaktifkan'}.", "INFO")
+    return jsonify({'success': True, 'tracing': tracer.get_stats()})
+
+@app.route('/api/instrumentation/profiler', methods=['POST'])
+def handle_profiler():
+    data = request.json or {}
+    action = data.get('action', 'start')
+    if action not in ('start', 'stop'):
+        return jsonify({'error': "action harus 'start' atau 'stop'"}), 400
+    try:
+        duration, interval = float(data.get('duration', 30)), float(data.get('interval', 0.01))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'duration dan interval harus berupa angka'}), 400
+    if not control_profiler(action, duration, interval):
+        return jsonify({'error': 'Profiler sedang berjalan'}), 409
+    if action == 'start':
+        log_message("Instrumentation", f"Sampling profiler berjalan {profiler.duration:g} detik (interval {profiler.interval * 1000:g} ms).", "INFO")
+    return jsonify({'success': True, 'profiler': profiler.get_stats()})
+
+@app.route('/api/instrumentation/<kind>.folded')
+def download_folded(kind: str):
+    """Folded stacks untuk flamegraph.pl, speedscope, atau inferno; stack diawali "panel" atau "shard-N" saat sharding aktif."""
+    if kind not in ('tracing', 'profiler'):
+        return jsonify({'error': 'Jenis tidak dikenal'}), 404
+    folded = tracer.folded() if kind == 'tracing' else profiler.folded()
+    if supervisor is not None:
+        folded = "".join(f"panel;{line}\n" for line in folded.splitlines())
+        for index, report in supervisor.collect_instrumentation(include_folded=True).items():
+            folded += "".join(f"shard-{index};{line}\n" for line in report[kind]['folded'].splitlines())
+    filename = f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return Response(folded, mimetype='text/plain', headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 # --- WebSocket Events ---
 @socketio.on('connect')
 def handle_connect():
+    log_broadcaster.add_client(request.sid)
+    status_tracker.ensure_push()
     log_message("Web Client", "New client connected to panel", "INFO")
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    log_broadcaster.remove_client(request.sid)
     log_message("Web Client", "Client disconnected from panel", "INFO")
 
+# --- Account Authentication ---
+class AuthCache:
+    """Cache hasil validasi token (token -> user_id/username) dengan TTL, disimpan di state store.
+
+    Token tidak disimpan apa adanya: key adalah token_digest(token). Satu baris per token
+    di namespace 'auth_cache', sehingga shard yang menulis bersamaan tidak saling menimpa.
+    """
+    NAMESPACE = 'auth_cache'
+
+    def __init__(self, store: StateStore, ttl_seconds: float = 6 * 3600):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, token: str) -> tuple | None:
+        entry = self.store.get(self.NAMESPACE, token_digest(token))
+        if not entry or time.time() - entry.get('verified_at', 0) > self.ttl_seconds:
+            return None
+        return entry['user_id'], entry['username']
+
+    def put_many(self, identities: dict):
+        """Menandai banyak identitas untuk ditulis pada flush state store berikutnya."""
+        now = time.time()
+        for token, (user_id, username) in identities.items():
+            entry = {'user_id': user_id, 'username': username, 'verified_at': now}
+            self.store.mark_dirty(self.NAMESPACE, token_digest(token), lambda entry=entry: entry)
+
+auth_cache = AuthCache(state_store)
+AUTH_MAX_WORKERS = 8
+
+def authenticate_accounts(tokens: list, http_settings: dict, progress=None) -> dict:
+    """Membuat DiscordAccount untuk banyak token sekaligus.
+
+    Token yang ada di auth cache tidak divalidasi ulang; sisanya divalidasi paralel dengan
+    pool terbatas sehingga satu token yang lambat/tidak valid tidak menahan token lain.
+    Mengembalikan dict token -> DiscordAccount (hanya yang berhasil). `progress(stage, done, total)`
+    dipanggil setiap satu token selesai.
+    """
+    accounts, pending = {}, []
+    for token in tokens:
+        identity = auth_cache.get(token)
+        if identity:
+            accounts[token] = DiscordAccount(token, http_settings, identity=identity)
+        else:
+            pending.append(token)
+
+    if pending:
+        done = itertools.count(len(accounts) + 1)
+        def authenticate(token: str) -> DiscordAccount:
+            account = DiscordAccount(token, http_settings)
+            if progress: progress('authenticating', next(done), len(tokens))
+            return account
+        with ThreadPoolExecutor(max_workers=min(AUTH_MAX_WORKERS, len(pending)), thread_name_prefix="auth") as executor:
+            results = list(executor.map(authenticate, pending))
+        verified = {}
+        for account in results:
+            if account.user_id == "Unknown":
+                account.close()
+                continue
+            accounts[account.token] = account
+            verified[account.token] = (account.user_id, account.username)
+        auth_cache.put_many(verified)
+    return accounts
+
 # --- Bot Management Functions ---
-def initialize_bot():
-    """Initialize bot with current configuration."""
-    global global_config, bot_accounts, channel_handlers
-    
-    google_api_keys = [k.strip() for k in os.getenv('GOOGLE_API_KEYS', '').split(',') if k.strip()]
-    if not google_api_keys:
-        log_message("Error Kritis", "GOOGLE_API_KEYS tidak ditemukan di .env", "ERROR")
-        return False
+DEFAULT_CONFIG = {
+    "cooldown_hours": 24,
+    "global_settings": {
+        "language": "english", "reply_mode": "mention", "use_reply": True,
+        "delay_interval": 15, "fetch_cache_ttl": 5, "enable_local_chatter": True,
+        "local_chatter_delay_min": 2700, "local_chatter_delay_max": 5400,
+        "enable_auto_delete": False, "delete_after_messages": 5, "auto_delete_bulk": False
+    },
+    "http": dict(DEFAULT_HTTP_SETTINGS),
+    "reply_workers": {"concurrency": 4, "queue_size": 100},
+    "response_cache": {"max_size": 256, "ttl_seconds": 600},
+    "auth_cache_ttl_hours": 6,
+    "accounts": []
+}
+config_apply_lock = threading.Lock()
 
-    try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        log_message("Config Error", "config.json tidak ditemukan atau rusak. Membuat file default.", "WARNING")
-        config = {
-            "cooldown_hours": 24,
-            "global_settings": {
-                "language": "english", "reply_mode": "mention", "use_reply": True,
-                "delay_interval": 15, "enable_local_chatter": True,
-                "local_chatter_delay_min": 2700, "local_chatter_delay_max": 5400,
-                "enable_auto_delete": False, "delete_after_messages": 5
-            },
-            "accounts": []
-        }
-        with open('config.json', 'w') as f:
+class ConfigError(ValueError):
+    """Config tidak lolos validasi skema."""
+
+CONFIG_SECTIONS = ("global_settings", "http", "reply_workers", "response_cache")
+CONFIG_NUMBERS = {
+    ("cooldown_hours",): 0, ("auth_cache_ttl_hours",): 0,
+    ("global_settings", "delay_interval"): 1, ("global_settings", "fetch_cache_ttl"): 0,
+    ("global_settings", "local_chatter_delay_min"): 0, ("global_settings", "local_chatter_delay_max"): 0,
+    ("global_settings", "delete_after_messages"): 1,
+    ("reply_workers", "concurrency"): 1, ("reply_workers", "queue_size"): 1,
+    ("response_cache", "max_size"): 0, ("response_cache", "ttl_seconds"): 0,
+    **{("http", key): 0 for key in DEFAULT_HTTP_SETTINGS}
+}
+CONFIG_BOOLEANS = ("use_reply", "enable_local_chatter", "enable_auto_delete", "auto_delete_bulk")
+CONFIG_REPLY_MODES = ("mention", "all")
+
+def validate_config(config) -> dict:
+    """Memvalidasi skema config dan mengembalikan salinan ternormalisasi (channel id sebagai string tanpa duplikat)."""
+    if not isinstance(config, dict):
+        raise ConfigError("config harus berupa object JSON")
+    config = copy.deepcopy(config)
+    for section in CONFIG_SECTIONS:
+        if not isinstance(config.setdefault(section, {}), dict):
+            raise ConfigError(f"{section} harus berupa object")
+    for path, minimum in CONFIG_NUMBERS.items():
+        parent = config if len(path) == 1 else config[path[0]]
+        value = parent.get(path[-1])
+        if value is None: continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+            raise ConfigError(f"{'.'.join(path)} harus berupa angka >= {minimum}")
+    settings = config["global_settings"]
+    for key in CONFIG_BOOLEANS:
+        if key in settings and not isinstance(settings[key], bool):
+            raise ConfigError(f"global_settings.{key} harus true/false")
+    if settings.get("reply_mode", "mention") not in CONFIG_REPLY_MODES:
+        raise ConfigError(f"global_settings.reply_mode harus salah satu dari {', '.join(CONFIG_REPLY_MODES)}")
+
+    accounts = config.setdefault("accounts", [])
+    if not isinstance(accounts, list):
+        raise ConfigError("accounts harus berupa list")
+    for index, account in enumerate(accounts):
+        if not isinstance(account, dict) or not isinstance(account.get("token"), str) or not account["token"].strip():
+            raise ConfigError(f"accounts[{index}] harus punya token berupa string")
+        channels = account.get("channels", [])
+        if not isinstance(channels, list):
+            raise ConfigError(f"accounts[{index}].channels harus berupa list")
+        account["token"] = account["token"].strip()
+        account["channels"] = list(dict.fromkeys(str(c).strip() for c in channels if str(c).strip()))
+    return config
+
+class ConfigService:
+    """Satu-satunya pintu baca/tulis config.json.
+
+    Config di-parse dan divalidasi sekali lalu disimpan di memori; pembacaan berikutnya hanya
+    membandingkan signature file (mtime, ukuran, inode). Penulisan memakai file sementara +
+    rename di bawah lock sehingga pembaca tidak pernah melihat file setengah jadi. Listener
+    dipanggil setelah config berubah, baik lewat `save`/`update` maupun diedit langsung di disk
+    (terdeteksi oleh `watch`). Dict yang dikembalikan `get` dipakai bersama: jangan diubah.
+    """
+    CHECK_INTERVAL = 2.0
+
+    def __init__(self, filename: str = "config.json"):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._config = None
+        self._signature = None
+        self._listeners = []
+        self._watch_job = None
+        self.loads = 0
+        self.cache_hits = 0
+        self.writes = 0
+
+    def _file_signature(self) -> tuple | None:
+        try:
+            stat = os.stat(self.filename)
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            return None
+
+    def _load(self, signature: tuple | None) -> dict:
+        try:
+            with open(self.filename, 'r') as f:
+                config = validate_config(json.load(f))
+        except FileNotFoundError:
+            if self._config is None:
+                log_message("Config Error", "config.json tidak ditemukan. Membuat file default.", "WARNING")
+                return self._write(validate_config(DEFAULT_CONFIG))
+            # Editor/deploy bisa menghapus file sesaat saat menggantinya: jangan tulis default
+            log_message("Config Error", "config.json hilang. Memakai config terakhir yang valid.", "ERROR")
+            self._signature = signature
+            return self._config
+        except (json.JSONDecodeError, ConfigError) as e:
+            if self._config is None and isinstance(e, json.JSONDecodeError):
+                log_message("Config Error", "config.json rusak. Membuat file default.", "WARNING")
+                return self._write(validate_config(DEFAULT_CONFIG))
+            # File yang sedang diedit tangan bisa sementara tidak valid: jangan ditimpa
+            log_message("Config Error", f"config.json tidak valid: {str(e)}. Memakai config terakhir yang valid.", "ERROR")
+            self._signature = signature
+            if self._config is None:
+                self._config = validate_config(DEFAULT_CONFIG)
+            return self._config
+        self.loads += 1
+        self._config, self._signature = config, signature
+        return config
+
+    def _write(self, config: dict) -> dict:
+        tmp_path = f"{self.filename}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(config, f, indent=4)
+        os.replace(tmp_path, self.filename)
+        self.writes += 1
+        self._config, self._signature = config, self._file_signature()
+        return config
 
-    global_config = {
-        "google_api_keys": google_api_keys, "used_api_keys": set(),
-        "cooldown_seconds": config.get("cooldown_hours", 24) * 3600
-    }
-    
-    bot_accounts.clear()
-    stop_all_handlers()
-    
+    def get(self) -> dict:
+        with self._lock:
+            signature = self._file_signature()
+            if self._config is not None and signature == self._signature:
+                self.cache_hits += 1
+                return self._config
+            return self._load(signature)
+
+    def save(self, config: dict) -> dict:
+        """Memvalidasi lalu menulis config secara atomik; memberi tahu listener. ConfigError bila tidak valid."""
+        with self._lock:
+            config = self._write(validate_config(config))
+        self._notify(config)
+        return config
+
+    def update(self, mutator) -> dict:
+        """Read-modify-write atomik: `mutator` mengubah salinan config terbaru di bawah lock."""
+        with self._lock:
+            config = copy.deepcopy(self.get())
+            mutator(config)
+            config = self._write(validate_config(config))
+        self._notify(config)
+        return config
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, config: dict):
+        for listener in list(self._listeners):
+            try:
+                listener(config)
+            except Exception as e:
+                log_message("Config Error", f"Listener config gagal: {str(e)}", "ERROR")
+
+    def watch(self):
+        """Mulai memeriksa perubahan config.json di disk secara berkala."""
+        if self._watch_job is None:
+            self._watch_job = scheduler.schedule(self.CHECK_INTERVAL, self._watch_tick, name="config-watch")
+
+    def _watch_tick(self) -> float:
+        with self._lock:
+            previous = self._config
+            if previous is None or self._file_signature() == self._signature:
+                return self.CHECK_INTERVAL
+            config = self.get()
+        if config is not previous:
+            log_message("Config Updated", "Perubahan config.json di disk terdeteksi. Menerapkan config...", "INFO")
+            self._notify(config)
+        return self.CHECK_INTERVAL
+
+    def get_stats(self) -> dict:
+        return {'loads': self.loads, 'cache_hits': self.cache_hits, 'writes': self.writes}
+
+config_service = ConfigService()
+# Setiap perubahan config langsung diterapkan secara inkremental ke handler yang berjalan
+config_service.subscribe(lambda config: initialize_bot())
+
+def apply_config(config: dict, progress=None) -> dict:
+    """Menerapkan config secara inkremental dengan membandingkannya terhadap state yang berjalan.
+
+    Hanya akun/handler baru yang dibuat, hanya yang dihapus yang dihentikan, dan handler
+    yang tetap ada menerima pengaturan baru di tempat sehingga state-nya tidak hilang.
+    """
     global_settings = config.get("global_settings", {})
-    accounts_config = config.get("accounts", [])
-    
-    for acc_config in accounts_config:
+    http_settings = config.get("http", {})
+    summary = {'accounts_added': 0, 'accounts_removed': 0, 'handlers_started': 0, 'handlers_stopped': 0, 'handlers_updated': 0}
+
+    desired = {}
+    for acc_config in config.get("accounts", []):
         token = acc_config.get("token")
-        channel_ids = acc_config.get("channels", [])
         if not token: continue
-            
-        account = DiscordAccount(token)
-        if account.user_id == "Unknown": continue
-        bot_accounts[token] = account
-        
-        for channel_id in channel_ids:
+        if current_shard and shard_for_token(token, current_shard[1]) != current_shard[0]: continue
+        channel_ids = desired.setdefault(token, [])
+        for channel_id in acc_config.get("channels", []):
             if "MASUKKAN" in channel_id or not channel_id.strip(): continue
+            if channel_id not in channel_ids:
+                channel_ids.append(channel_id)
+    desired_keys = {f"{token}:{channel_id}" for token, channel_ids in desired.items() for channel_id in channel_ids}
+
+    for key in [k for k in channel_handlers if k not in desired_keys]:
+        channel_handlers.pop(key).stop()
+        summary['handlers_stopped'] += 1
+    for token in [t for t in bot_accounts if t not in desired]:
+        bot_accounts.pop(token).close()
+        summary['accounts_removed'] += 1
+
+    for account in bot_accounts.values():
+        account.update_http_settings(http_settings)
+    new_accounts = authenticate_accounts([t for t in desired if t not in bot_accounts], http_settings, progress)
+    bot_accounts.update(new_accounts)
+    summary['accounts_added'] = len(new_accounts)
+
+    new_handlers = []
+    for token, channel_ids in desired.items():
+        account = bot_accounts.get(token)
+        if not account: continue
+        for channel_id in channel_ids:
+            key = f"{token}:{channel_id}"
+            handler = channel_handlers.get(key)
+            if handler:
+                if handler.settings != global_settings:
+                    handler.update_settings(global_settings)
+                    summary['handlers_updated'] += 1
+                continue
             handler = ChannelHandler(channel_id, global_settings, account)
-            channel_handlers[f"{token}:{channel_id}"] = handler
-            handler.start()
-            time.sleep(1)
+            channel_handlers[key] = handler
+            new_handlers.append(handler)
+
+    # Sebar poll pertama handler baru merata dalam satu delay_interval (pengganti time.sleep(1))
+    delay_interval = global_settings.get("delay_interval", 15)
+    if progress: progress('starting_handlers', 0, len(new_handlers))
+    for index, handler in enumerate(new_handlers):
+        handler.start(start_delay=delay_interval * index / len(new_handlers))
+    summary['handlers_started'] = len(new_handlers)
+    return summary
+
+def initialize_bot(progress=None):
+    """Initialize bot with current configuration (incremental: only changed handlers are touched)."""
+    global global_config
+    if supervisor is not None:
+        supervisor.broadcast('reload')
+        return True
+    
+    google_api_keys = [k.strip() for k in os.getenv('GOOGLE_API_KEYS', '').split(',') if k.strip()]
+    if not google_api_keys:
+        log_message("Error Kritis", "GOOGLE_API_KEYS tidak ditemukan di .env", "ERROR")
+        return False
+
+    with config_apply_lock:
+        config = config_service.get()
+        global_config = {
+            "google_api_keys": google_api_keys,
+            "cooldown_seconds": config.get("cooldown_hours", 24) * 3600
+        }
+        api_key_pool.configure(google_api_keys, global_config["cooldown_seconds"])
+        auth_cache.ttl_seconds = config.get("auth_cache_ttl_hours", 6) * 3600
+        cache_settings = config.get("response_cache", {})
+        response_cache.configure(cache_settings.get("max_size", 256), cache_settings.get("ttl_seconds", 600))
+        reply_settings = config.get("reply_workers", {})
+        reply_workers.configure(reply_settings.get("concurrency", 4), reply_settings.get("queue_size", 100))
+        
+        summary = apply_config(config, progress)
 
-    log_message("Bot Initialized", f"Started {len(bot_accounts)} accounts with {len(channel_handlers)} handlers", "SUCCESS")
+    log_message(
+        "Bot Initialized",
+        f"{len(bot_accounts)} accounts, {len(channel_handlers)} handlers | "
+        f"+{summary['handlers_started']} started, -{summary['handlers_stopped']} stopped, "
+        f"{summary['handlers_updated']} updated, +{summary['accounts_added']}/-{summary['accounts_removed']} accounts",
+        "SUCCESS"
+    )
     return True
 
+def full_restart():
+    """Restart penuh: menghentikan semua handler dan menutup semua akun sebelum inisialisasi ulang."""
+    if supervisor is not None:
+        supervisor.broadcast('full_restart')
+        return True
+    with config_apply_lock:
+        stop_all_handlers()
+        for account in bot_accounts.values():
+            account.close()
+        bot_accounts.clear()
+    return initialize_bot()
+
 def stop_all_handlers():
     for handler in channel_handlers.values():
         handler.stop()
     channel_handlers.clear()
     log_message("Handlers Stopped", "All channel handlers stopped", "WARNING")
 
+# --- Sharding ---
+SHARD_STATUS_INTERVAL = 2.0
+SHARD_RESPAWN_DELAY = 5.0
+
+def shard_for_token(token: str, shard_count: int) -> int:
+    """Affinity akun ke shard: semua channel satu token selalu berada di proses yang sama."""
+    return int(token_digest(token)[:8], 16) % shard_count
+
+class ShardSupervisor:
+    """Membagi channel handler ke N proses worker; proses panel hanya melayani web, log, dan status.
+
+    Setiap worker terhubung lewat Pipe: worker mengirim ('log', entri), ('status', snapshot),
+    ('ready', berhasil), dan ('instrumentation', data); panel mengirim ('reload',), ('full_restart',),
+    ('stop',), ('tracing', aktif, reset), ('profiler', aksi, durasi, interval), dan ('instrumentation', folded).
+    Worker yang mati dijalankan ulang otomatis setelah SHARD_RESPAWN_DELAY detik.
+    """
+    def __init__(self, shard_count: int):
+        self.shard_count = shard_count
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._shards = {}
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for index in range(self.shard_count):
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        if not self.running: return
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=run_shard_worker, args=(index, self.shard_count, child_conn), name=f"shard-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._shards[index] = {
+                'process': process, 'conn': parent_conn, 'send_lock': threading.Lock(),
+                'ready': threading.Event(), 'status': None, 'stats': None, 'handlers_running_at': None, 'updated_at': None,
+                'instrumentation': None, 'instrumentation_ready': threading.Event(), 'restarts': self._shards.get(index, {}).get('restarts', -1) + 1
+            }
+        threading.Thread(target=self._reader_loop, args=(index, parent_conn), name=f"shard-{index}-reader", daemon=True).start()
+        if tracer.enabled:
+            parent_conn.send(('tracing', True, False))
+
+    def _reader_loop(self, index: int, conn):
+        shard = self._shards[index]
+        while True:
+            try:
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == 'log':
+                log_pipeline.submit(payload)
+            elif kind == 'status':
+                with self._lock:
+                    shard['status'], shard['stats'] = payload['status'], payload['stats']
+                    shard['handlers_running_at'], shard['updated_at'] = payload['handlers_running_at'], time.time()
+                self._record_handlers_running()
+            elif kind == 'ready':
+                shard['ready'].set()
+            elif kind == 'instrumentation':
+                shard['instrumentation'] = payload
+                shard['instrumentation_ready'].set()
+        shard['ready'].set()
+        shard['instrumentation_ready'].set()
+        if self.running:
+            log_message("Shard Error", f"Shard {index} berhenti (exit code {shard['process'].exitcode}). Menjalankan ulang...", "ERROR")
+            scheduler.schedule(SHARD_RESPAWN_DELAY, lambda: self._spawn(index), name=f"respawn:shard-{index}")
+
+    def _record_handlers_running(self):
+        """handlers_running_seconds panel = saat shard terakhir yang punya handler selesai poll pertama."""
+        if startup_metrics['handlers_running_seconds'] is not None: return
+        with self._lock:
+            reports = [(shard['status'], shard['handlers_running_at']) for shard in self._shards.values()]
+        if len(reports) < self.shard_count or any(status is None for status, _ in reports): return
+        running_at = []
+        for status, at in reports:
+            if not status.get('channels'): continue
+            if at is None: return
+            running_at.append(at)
+        if running_at:
+            startup_metrics['handlers_running_seconds'] = round(max(running_at) - PROCESS_START_WALL, 3)
+
+    def wait_ready(self, timeout: float = 60.0) -> bool:
+        deadline = time.monotonic() + timeout
+        for shard in list(self._shards.values()):
+            if not shard['ready'].wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return all(shard['process'].is_alive() for shard in self._shards.values())
+
+    def broadcast(self, command: str, *args):
+        for index, shard in list(self._shards.items()):
+            try:
+                with shard['send_lock']:
+                    shard['conn'].send((command, *args))
+            except (OSError, ValueError) as e:
+                log_message("Shard Error", f"Gagal mengirim '{command}' ke shard {index}: {str(e)}", "ERROR")
+
+    def stop(self, timeout: float = 10.0):
+        self.running = False
+        self.broadcast('stop')
+        for shard in list(self._shards.values()):
+            shard['process'].join(timeout)
+            if shard['process'].is_alive():
+                shard['process'].terminate()
+
+    def collect_instrumentation(self, include_folded: bool, timeout: float = 5.0) -> dict:
+        """Meminta span dan hasil profiler dari setiap shard; shard yang tidak menjawab dilewati."""
+        shards = dict(self._shards)
+        for shard in shards.values():
+            shard['instrumentation'] = None
+            shard['instrumentation_ready'].clear()
+        self.broadcast('instrumentation', include_folded)
+        deadline = time.monotonic() + timeout
+        collected = {}
+        for index, shard in sorted(shards.items()):
+            shard['instrumentation_ready'].wait(max(0.0, deadline - time.monotonic()))
+            if shard['instrumentation'] is not None:
+                collected[index] = shard['instrumentation']
+        return collected
+
+    def merge_status(self, snapshot: dict):
+        """Menggabungkan akun dan channel dari semua shard ke snapshot status panel."""
+        shards = []
+        with self._lock:
+            for index, shard in sorted(self._shards.items()):
+                status = shard['status'] or {}
+                snapshot['accounts'].update(status.get('accounts', {}))
+                snapshot['channels'].update(status.get('channels', {}))
+                snapshot['active_channels'] += status.get('active_channels', 0)
+                shards.append({
+                    'index': index, 'pid': shard['process'].pid, 'alive': shard['process'].is_alive(),
+                    'restarts': shard['restarts'],
+                    'accounts': status.get('total_accounts', 0), 'active_channels': status.get('active_channels', 0),
+                    'startup': status.get('startup')
+                })
+        snapshot['total_accounts'] = len(snapshot['accounts'])
+        snapshot['shards'] = shards
+
+    def merge_stats(self, stats: dict):
+        """Menggabungkan counter runtime semua shard ke stats panel."""
+        shards = []
+        with self._lock:
+            for index, shard in sorted(self._shards.items()):
+                shard_stats = shard['stats'] or {}
+                stats['accounts'].update(shard_stats.get('accounts', {}))
+                stats['channels'].update(shard_stats.get('channels', {}))
+                shards.append({
+                    'index': index, 'updated_at': shard['updated_at'],
+                    'api_keys': shard_stats.get('api_keys'), 'reply_workers': shard_stats.get('reply_workers'),
+                    'response_cache': shard_stats.get('response_cache'), 'state_store': shard_stats.get('state_store')
+                })
+        stats['shards'] = shards
+
+def run_shard_worker(index: int, shard_count: int, conn):
+    """Entry point proses shard: menjalankan handler untuk token milik shard ini dan melapor ke panel."""
+    global current_shard
+    current_shard = (index, shard_count)
+    app.logger.disabled = True
+    log_pipeline.console_enabled = False
+    send_lock = threading.Lock()
+
+    def send(kind: str, payload):
+        with send_lock:
+            conn.send((kind, payload))
+
+    log_pipeline.forward = lambda entry: send('log', {**entry, 'shard': index})
+
+    def report_status():
+        running = startup_metrics['handlers_running_seconds']
+        send('status', {
+            'status': build_status_snapshot(), 'stats': build_status_stats(),
+            'handlers_running_at': PROCESS_START_WALL + running if running is not None else None
+        })
+        return SHARD_STATUS_INTERVAL
+
+    send('ready', initialize_bot())
+    scheduler.schedule(0, report_status, name="shard-status")
+    while True:
+        try:
+            command, *args = conn.recv()
+        except (EOFError, OSError):
+            break
+        if command == 'stop':
+            break
+        elif command == 'reload':
+            initialize_bot()
+        elif command == 'full_restart':
+            full_restart()
+        elif command == 'tracing':
+            set_tracing(*args)
+        elif command == 'profiler':
+            control_profiler(*args)
+        elif command == 'instrumentation':
+            send('instrumentation', instrumentation_report(*args))
+    stop_all_handlers()
+    log_pipeline.flush()
+    state_store.close()
+
+# --- Startup ---
+startup_lock = threading.Lock()
+first_polls = 0
+
+def report_startup_progress(stage: str, done: int = 0, total: int = 0):
+    """Mencatat tahap inisialisasi bot dan mendorongnya ke panel (event 'startup_progress')."""
+    startup_metrics['progress'] = {'stage': stage, 'done': done, 'total': total}
+    socketio.emit('startup_progress', startup_metrics['progress'])
+
+def record_first_poll():
+    """Dipanggil sekali per handler; mencatat waktu saat semua handler sudah menyelesaikan poll pertama."""
+    global first_polls
+    with startup_lock:
+        first_polls += 1
+        if startup_metrics['handlers_running_seconds'] is None and first_polls >= len(channel_handlers):
+            startup_metrics['handlers_running_seconds'] = round(time.perf_counter() - PROCESS_START, 3)
+
+@app.before_request
+def record_first_request():
+    if startup_metrics['first_request_seconds'] is None:
+        startup_metrics['first_request_seconds'] = round(time.perf_counter() - PROCESS_START, 3)
+
+@app.route('/api/startup')
+def get_startup_profile():
+    return jsonify(startup_metrics)
+
+def start_bot(progress=None) -> bool:
+    """Menjalankan bot (langsung atau lewat supervisor shard) lalu mencatat waktu cold start."""
+    global supervisor
+    if progress: progress('loading')
+    shard_count = int(os.getenv('SHARDS', 1))
+    if shard_count > 1:
+        supervisor = ShardSupervisor(shard_count)
+        supervisor.start()
+        atexit.register(supervisor.stop)
+        ready = supervisor.wait_ready()
+    else:
+        ready = initialize_bot(progress)
+    if progress: progress('ready')
+    if ready:
+        startup_metrics['cold_start_seconds'] = round(time.perf_counter() - PROCESS_START, 3)
+        log_message("System Ready", f"Bot and web panel are ready! (cold start {startup_metrics['cold_start_seconds']}s)", "SUCCESS")
+    else:
+        log_message("System Warning", "Bot initialization failed, but web panel is available", "WARNING")
+    return ready
+
 # --- Main Execution ---
 if __name__ == "__main__":
     setup_logging()
+    restore_system_logs()
     log_message("System Starting", "Discord Bot Panel is starting up...", "INFO")
     
-    if initialize_bot():
-        log_message("System Ready", "Bot and web panel are ready!", "SUCCESS")
+    config_service.watch()
+    if os.getenv('FAST_START', 'false').lower() == 'true':
+        # Panel langsung melayani request; inisialisasi bot berjalan di belakang
+        threading.Thread(target=start_bot, args=(report_startup_progress,), name="bot-startup", daemon=True).start()
     else:
-        log_message("System Warning", "Bot initialization failed, but web panel is available", "WARNING")
+        start_bot()
     
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'False').lower() == 'true'
+    startup_metrics['panel_ready_seconds'] = round(time.perf_counter() - PROCESS_START, 3)
     socketio.run(app, host='0.0.0.0', port=port, debug=debug)
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""Benchmark offline untuk bot: server Discord palsu lokal + backend Gemini stub.
+
+Contoh:
+    python benchmark.py --accounts 5 --channels 4 --duration 30
+    python benchmark.py --latency-ms 80 --rate-limit-every 20
+    python benchmark.py --micro-only --json
+
+Benchmark berjalan di direktori sementara (config.json, pesan.txt, cache) sehingga file
+milik instalasi sebenarnya tidak tersentuh.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DISCORD_EPOCH_MS = 1420070400000
+USER_AUTHOR = {'id': '999', 'username': 'bench-user'}
+WORDS = (
+    "bitcoin eth market chart dip moon gm wagmi alpha airdrop staking yield wallet "
+    "gas fees layer2 rollup token launch community vibes builders early bullish"
+).split()
+
+def snowflake(timestamp: float, sequence: int = 0) -> str:
+    return str(((int(timestamp * 1000) - DISCORD_EPOCH_MS) << 22) + (sequence & 0x3FFFFF))
+
+def percentile(values: list, pct: float) -> float | None:
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# --- Fake Discord ---
+class FakeDiscord:
+    """State server Discord palsu: aliran pesan per channel, latensi tetap, dan injeksi 429."""
+    def __init__(self, latency: float, rate_limit_every: int, message_interval: float):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.message_interval = message_interval
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fetches = 0
+        self.rate_limited = 0
+        self.sent = 0
+        self.deleted = 0
+        self.created_at = {}
+        self.reply_latencies = []
+
+    def channel_messages(self, channel_id: str, limit: int, after: str | None) -> list:
+        """Satu pesan pengguna baru per `message_interval` detik di setiap channel."""
+        produced = int((time.time() - self.started_at) / self.message_interval)
+        messages = []
+        for seq in range(produced, max(-1, produced - limit), -1):
+            created = self.started_at + seq * self.message_interval
+            msg_id = snowflake(created, int(channel_id) % 1000 * 1000 + seq % 1000)
+            if after and int(msg_id) <= int(after):
+                break
+            with self._lock:
+                self.created_at.setdefault(msg_id, created)
+            words = random.Random(f"{channel_id}:{seq}").sample(WORDS, 6)
+            messages.append({
+                'id': msg_id, 'channel_id': channel_id, 'author': USER_AUTHOR,
+                'content': f"{' '.join(words)} #{seq}", 'mentions': []
+            })
+        return messages
+
+    def record_reply(self, payload: dict):
+        reference = (payload.get('message_reference') or {}).get('message_id')
+        with self._lock:
+            self.sent += 1
+            created = self.created_at.get(reference)
+            if created is not None:
+                self.reply_latencies.append(time.time() - created)
+
+    def should_rate_limit(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+            if limited: self.rate_limited += 1
+            return bool(limited)
+
+def make_handler(state: FakeDiscord):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, body, status: int = 200, headers: dict | None = None):
+            data = json.dumps(body).encode() if body is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _begin(self) -> bool:
+            """Latensi + 429 buatan. Mengembalikan False bila request sudah dijawab 429."""
+            if state.latency: time.sleep(state.latency)
+            if state.should_rate_limit():
+                self._send({'message': 'You are being rate limited.', 'retry_after': 0.5, 'global': False}, 429,
+                           {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '0.5'})
+                return False
+            return True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not self._begin(): return
+            if url.path.endswith('/users/@me'):
+                token = self.headers.get('Authorization', '')
+                return self._send({'id': str(abs(hash(token)) % 10**17), 'username': f"bench-{token[-4:]}"})
+            match = re.search(r'/channels/(\d+)/messages$', url.path)
+            if not match: return self._send({'message': 'Not Found'}, 404)
+            query = parse_qs(url.query)
+            state.fetches += 1
+            self._send(state.channel_messages(match.group(1), int(query.get('limit', ['50'])[0]), query.get('after', [None])[0]))
+
+        def do_POST(self):
+            if not self._begin(): return
+            payload = self._read_json()
+            if self.path.endswith('/bulk-delete'):
+                state.deleted += len(payload.get('messages', []))
+                return self._send(None, 204)
+            state.record_reply(payload)
+            self._send({'id': snowflake(time.time(), random.randrange(1 << 22)), 'content': payload.get('content')})
+
+        def do_DELETE(self):
+            if not self._begin(): return
+            state.deleted += 1
+            self._send(None, 204)
+
+    return Handler
+
+# --- Environment ---
+def prepare_workdir(args) -> str:
+    """Membuat direktori kerja sementara berisi config.json dan pesan.txt untuk benchmark."""
+    workdir = tempfile.mkdtemp(prefix="bot-bench-")
+    rng = random.Random(42)
+    with open(os.path.join(workdir, 'pesan.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(args.corpus_size):
+            f.write(" ".join(rng.choices(WORDS, k=rng.randint(4, 12))) + "\n")
+    accounts = [
+        {'token': f"bench-token-{a:04d}", 'channels': [str(100000 + a * 1000 + c) for c in range(args.channels)]}
+        for a in range(args.accounts)
+    ]
+    config = {
+        'cooldown_hours': 1,
+        'global_settings': {
+            'delay_interval': args.delay_interval, 'reply_mode': 'all', 'use_reply': True,
+            'enable_local_chatter': False, 'enable_auto_delete': False, 'fetch_cache_ttl': 0
+        },
+        'reply_workers': {'concurrency': args.reply_workers},
+        'accounts': accounts
+    }
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+    return workdir
+
+def import_app(api_base: str, args):
+    """Import app.py dengan environment benchmark (harus dipanggil setelah chdir ke workdir)."""
+    os.environ['DISCORD_API_BASE'] = api_base
+    os.environ['GEMINI_BACKEND'] = 'stub'
+    os.environ['GEMINI_STUB_LATENCY'] = str(args.gemini_latency_ms / 1000)
+    os.environ['GOOGLE_API_KEYS'] = ",".join(f"bench-key-{i}" for i in range(4))
+    os.environ['LOG_CONSOLE'] = 'false'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+    app.app.logger.disabled = True
+    return app
+
+def resource_snapshot() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss_mb = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss_mb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        pass
+    return {'cpu': usage.ru_utime + usage.ru_stime, 'max_rss_mb': usage.ru_maxrss / 1024, 'rss_mb': rss_mb,
+            'threads': threading.active_count()}
+
+def poll_count(app) -> float:
+    text = app.app.test_client().get('/metrics').get_data(as_text=True)
+    return sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith('poll_lag_seconds_count'))
+
+# --- Benchmarks ---
+def run_load(app, state: FakeDiscord, args) -> dict:
+    """Menjalankan initialize_bot() dengan N akun x M channel selama `duration` detik."""
+    before = resource_snapshot()
+    start = time.perf_counter()
+    if not app.initialize_bot():
+        raise SystemExit("initialize_bot() gagal")
+    init_seconds = time.perf_counter() - start
+
+    # Lewati satu delay_interval agar semua handler (yang di-stagger) sudah mulai poll
+    time.sleep(args.delay_interval)
+    polls_start, cpu_start, t0 = poll_count(app), resource_snapshot()['cpu'], time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - t0
+    polls = poll_count(app) - polls_start
+    after = resource_snapshot()
+    handlers = len(app.channel_handlers)
+    app.stop_all_handlers()
+
+    return {
+        'accounts': args.accounts, 'channels_per_account': args.channels,
+        'handlers': handlers, 'init_seconds': round(init_seconds, 3),
+        'polls_per_second': round(polls / elapsed, 2),
+        'discord_requests': state.requests, 'discord_fetches': state.fetches, 'rate_limited': state.rate_limited,
+        'replies_sent': state.sent,
+        'reply_latency_p50': round(percentile(state.reply_latencies, 50) or 0, 3),
+        'reply_latency_p99': round(percentile(state.reply_latencies, 99) or 0, 3),
+        'cpu_percent': round((after['cpu'] - cpu_start) / elapsed * 100, 1),
+        'rss_mb': round(after['rss_mb'], 1) if after['rss_mb'] else None,
+        'max_rss_mb': round(after['max_rss_mb'], 1),
+        'threads_before': before['threads'], 'threads': after['threads']
+    }
+
+def bench_smart_message(app, iterations: int) -> dict:
+    manager = app.LocalMessageManager()
+    rng = random.Random(7)
+    contexts = [" ".join(rng.choices(WORDS, k=8)) for _ in range(64)]
+    manager.get_smart_message(contexts[0])  # Muat corpus di luar pengukuran
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        manager.get_smart_message(contexts[i % len(contexts)])
+        timings.append(time.perf_counter() - start)
+    return {
+        'corpus_size': len(manager.all_messages), 'iterations': iterations,
+        'p50_us': round(percentile(timings, 50) * 1e6, 1), 'p99_us': round(percentile(timings, 99) * 1e6, 1),
+        'top_third_rate': smart_message_quality(app, contexts[:4])
+    }
+
+def smart_message_quality(app, contexts: list, picks: int = 50) -> float:
+    """Porsi pilihan yang skornya masuk sepertiga teratas korpus untuk konteksnya (idealnya 1.0)."""
+    hits = total = 0
+    for context in contexts:
+        manager = app.LocalMessageManager()
+        context_words = frozenset(context.lower().split())
+        is_crypto = not context_words.isdisjoint(app.CRYPTO_KEYWORDS)
+        scores = sorted((manager._similarity(tokens, context_words, is_crypto) for tokens in manager._corpus.token_sets), reverse=True)
+        cutoff = scores[len(scores) // 3]
+        for _ in range(picks):
+            message = manager.get_smart_message(context)
+            hits += manager._calculate_context_similarity(message, context) >= cutoff
+            total += 1
+    return round(hits / total, 3)
+
+def bench_log_message(app, iterations: int) -> dict:
+    start = time.perf_counter()
+    for i in range(iterations):
+        app.log_message("Benchmark", f"entry {i}", "INFO")
+    submit_seconds = time.perf_counter() - start
+    app.log_pipeline.flush(timeout=60)
+    total_seconds = time.perf_counter() - start
+    return {
+        'iterations': iterations, 'submit_us': round(submit_seconds / iterations * 1e6, 2),
+        'drain_per_second': round(iterations / total_seconds), 'dropped': app.log_pipeline.get_stats()['dropped']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline bot Discord (server Discord palsu + Gemini stub).")
+    parser.add_argument('--accounts', type=int, default=5)
+    parser.add_argument('--channels', type=int, default=4, help="channel per akun")
+    parser.add_argument('--duration', type=float, default=20, help="detik pengukuran setelah semua handler mulai")
+    parser.add_argument('--delay-interval', type=int, default=2)
+    parser.add_argument('--message-interval', type=float, default=3, help="detik antar pesan pengguna baru per channel")
+    parser.add_argument('--latency-ms', type=float, default=20, help="latensi server Discord palsu")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="jawab 429 setiap request ke-N (0 = mati)")
+    parser.add_argument('--gemini-latency-ms', type=float, default=300)
+    parser.add_argument('--reply-workers', type=int, default=4)
+    parser.add_argument('--corpus-size', type=int, default=20000, help="jumlah baris pesan.txt sintetis")
+    parser.add_argument('--micro-iterations', type=int, default=20000)
+    parser.add_argument('--micro-only', action='store_true', help="hanya microbenchmark")
+    parser.add_argument('--skip-micro', action='store_true', help="lewati microbenchmark")
+    parser.add_argument('--json', action='store_true', help="cetak hasil sebagai JSON")
+    args = parser.parse_args()
+
+    state = FakeDiscord(args.latency_ms / 1000, args.rate_limit_every, args.message_interval)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-discord", daemon=True).start()
+
+    workdir = prepare_workdir(args)
+    os.chdir(workdir)
+    app = import_app(f"http://127.0.0.1:{server.server_port}/api/v9", args)
+
+    results = {}
+    if not args.micro_only:
+        results['load'] = run_load(app, state, args)
+    if not args.skip_micro:
+        results['get_smart_message'] = bench_smart_message(app, args.micro_iterations)
+        results['log_message'] = bench_log_message(app, args.micro_iterations)
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    from rich.console import Console
+    from rich.table import Table
+    console = Console()
+    for section, values in results.items():
+        table = Table(title=section, show_header=False)
+        for key, value in values.items():
+            table.add_row(key, str(value))
+        console.print(table)
+    console.print(f"[dim]Workdir: {workdir}[/dim]")
+
+if __name__ == "__main__":
+    main()
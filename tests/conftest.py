@@ -0,0 +1,20 @@
+"""Menyiapkan lingkungan terisolasi sebelum app diimport: direktori kerja sementara, backend AI stub."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app membaca environment dan file relatif (pesan.txt, config.json) saat diimport
+WORKDIR = tempfile.mkdtemp(prefix="bot-tests-")
+os.chdir(WORKDIR)
+os.environ.update({
+    'STATE_DB': os.path.join(WORKDIR, "bot_state.db"),
+    'LOG_HISTORY_DIR': os.path.join(WORKDIR, "log_history"),
+    'LOG_CONSOLE': "false",
+    'GEMINI_BACKEND': "stub",
+    'GEMINI_STUB_LATENCY': "0",
+    'GOOGLE_API_KEYS': "test-key",
+    'DISCORD_API_BASE': "http://127.0.0.1:9",
+})
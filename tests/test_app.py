@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import app
+
+
+# --- Rate Limit ---
+def test_bucket_reserve_books_next_window_when_exhausted():
+    bucket = app.RateLimitBucket(limit=2, window=1.0)
+    assert bucket.reserve(100.0) == 0.0
+    assert bucket.reserve(100.2) == 0.0
+    # Jendela habis: slot ketiga dipesan di jendela berikutnya
+    assert bucket.reserve(100.4) == pytest.approx(0.6)
+    assert bucket.reserve(100.4) == pytest.approx(0.6)
+    assert bucket.reserve(100.4) == pytest.approx(1.6)
+
+def test_bucket_reserve_resets_after_window():
+    bucket = app.RateLimitBucket(limit=1, window=1.0)
+    assert bucket.reserve(10.0) == 0.0
+    assert bucket.reserve(11.0) == 0.0
+
+def test_bucket_update_from_headers():
+    bucket = app.RateLimitBucket()
+    bucket.reserve(50.0)
+    bucket.update(50.0, limit=5, remaining=0, reset_after=2.0)
+    assert bucket.limit == 5
+    assert bucket.wait_time(50.5) == pytest.approx(1.5)
+    assert bucket.wait_time(52.0) == 0.0
+
+def test_bucket_update_ignored_for_future_reservation():
+    bucket = app.RateLimitBucket(limit=1, window=1.0)
+    bucket.reserve(0.0)
+    bucket.reserve(0.0)  # Dipesan di jendela [1.0, 2.0)
+    bucket.update(0.5, limit=1, remaining=1, reset_after=0.1)
+    assert bucket.reset_at == pytest.approx(2.0)
+
+def test_bucket_exhaust():
+    bucket = app.RateLimitBucket(limit=5, window=1.0)
+    bucket.reserve(0.0)
+    bucket.exhaust(0.0, retry_after=3.0)
+    assert bucket.wait_time(1.0) == pytest.approx(2.0)
+    assert bucket.reserve(1.0) == pytest.approx(2.0)
+
+
+# --- Processed Ids ---
+def test_processed_id_store_floor_eviction():
+    store = app.ProcessedIdStore(window=3)
+    for msg_id in ("10", "20", "30"):
+        store.add(msg_id)
+    assert "20" in store and "15" not in store
+    store.add("40")  # "10" terbuang, batas naik ke 10
+    assert "10" in store and "5" in store
+    assert "15" not in store
+    store.add("50")  # "20" terbuang
+    assert "15" in store and "25" not in store
+    assert len(store) == 5
+
+def test_processed_id_store_ignores_duplicates_and_invalid_ids():
+    store = app.ProcessedIdStore(window=3)
+    store.add("10")
+    store.add("10")
+    assert len(store) == 1
+    assert "bukan-angka" in store  # Dianggap 0, di bawah batas
+
+
+# --- Log History ---
+@pytest.fixture
+def history(tmp_path):
+    history = app.LogHistory(str(tmp_path / "history"), segment_bytes=2048)
+    yield history
+    history.close()
+
+def test_log_history_cursor_round_trip(history):
+    for i in range(120):
+        history.append({'title': f"Pesan {i}", 'message': str(i), 'level': "INFO"})
+    seen, cursor = [], None
+    while True:
+        entries, cursor = history.query(cursor=cursor, limit=25)
+        seen.extend(int(entry['message']) for entry in entries)
+        if cursor is None: break
+    assert seen == list(range(119, -1, -1))
+    assert len(history._load_segments()) > 1
+
+def test_log_history_filters(history):
+    for i in range(6):
+        level = "ERROR" if i % 2 else "INFO"
+        history.append({'title': "Pesan Terkirim [alice]", 'message': f"a{i}", 'level': level})
+        history.append({'title': "Pesan Terkirim [bob]", 'message': f"b{i}", 'level': level})
+    history.append({'title': "Scheduler Error", 'message': "s", 'level': "ERROR"})
+
+    entries, cursor = history.query(levels=["error"])
+    assert cursor is None
+    assert [e['message'] for e in entries] == ["s", "b5", "a5", "b3", "a3", "b1", "a1"]
+    entries, _ = history.query(account="bob", levels=["INFO"])
+    assert [e['message'] for e in entries] == ["b4", "b2", "b0"]
+    entries, _ = history.query(title="Scheduler Error")
+    assert [e['message'] for e in entries] == ["s"]
+
+def test_log_history_time_range(history):
+    history.append({'title': "Lama", 'message': "old", 'level': "INFO"})
+    time.sleep(0.05)
+    middle = time.time()
+    history.append({'title': "Tengah", 'message': "mid", 'level': "INFO"})
+    time.sleep(0.05)
+    newest = time.time()
+    history.append({'title': "Baru", 'message': "new", 'level': "INFO"})
+
+    entries, _ = history.query(since=middle)
+    assert [e['message'] for e in entries] == ["new", "mid"]
+    entries, _ = history.query(since=middle, until=newest)
+    assert [e['message'] for e in entries] == ["mid"]
+
+
+# --- Status ---
+def test_merge_patch_marks_deleted_keys():
+    old = {'a': 1, 'b': {'x': 1, 'y': 2}, 'c': 3}
+    new = {'a': 1, 'b': {'x': 5}, 'd': 4}
+    assert app._merge_patch(old, new) == {'b': {'x': 5, 'y': None}, 'c': None, 'd': 4}
+    assert app._merge_patch(new, new) == {}
+
+
+# --- Config ---
+def test_validate_config_normalizes_channels():
+    config = app.validate_config({'accounts': [{'token': " abc ", 'channels': [123, "123", " 456 ", ""]}]})
+    assert config['accounts'][0] == {'token': "abc", 'channels': ["123", "456"]}
+    assert config['global_settings'] == {}
+
+@pytest.mark.parametrize("config", [
+    [],
+    {'global_settings': {'use_reply': "yes"}},
+    {'global_settings': {'reply_mode': "never"}},
+    {'global_settings': {'delay_interval': 0}},
+    {'reply_workers': {'concurrency': True}},
+    {'accounts': {}},
+    {'accounts': [{'token': 123}]},
+    {'accounts': [{'token': "abc", 'channels': "123"}]},
+])
+def test_validate_config_rejects_invalid(config):
+    with pytest.raises(app.ConfigError):
+        app.validate_config(config)
+
+@pytest.fixture
+def config_file(tmp_path):
+    return str(tmp_path / "config.json")
+
+def write_json(path: str, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    # Pastikan signature file berubah walau mtime beresolusi kasar
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+def test_config_service_writes_defaults_when_missing(config_file):
+    service = app.ConfigService(config_file)
+    config = service.get()
+    assert config['cooldown_hours'] == app.DEFAULT_CONFIG['cooldown_hours']
+    assert os.path.exists(config_file)
+
+def test_config_service_writes_defaults_when_first_load_is_corrupt(config_file):
+    with open(config_file, 'w') as f:
+        f.write("{ rusak")
+    service = app.ConfigService(config_file)
+    assert service.get()['accounts'] == []
+    with open(config_file) as f:
+        assert json.load(f)['accounts'] == []
+
+@pytest.mark.parametrize("broken", ["{ rusak", json.dumps({'global_settings': {'reply_mode': "never"}})])
+def test_config_service_keeps_last_valid_config(config_file, broken):
+    write_json(config_file, {'accounts': [{'token': "abc", 'channels': ["1"]}]})
+    service = app.ConfigService(config_file)
+    notified = []
+    service.subscribe(notified.append)
+    valid = service.get()
+
+    with open(config_file, 'w') as f:
+        f.write(broken)
+    os.utime(config_file, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+    service._watch_tick()
+    assert service.get() is valid
+    assert notified == []
+    with open(config_file) as f:
+        assert f.read() == broken  # File yang sedang diedit tidak ditimpa
+
+def test_config_service_keeps_config_when_file_disappears(config_file):
+    write_json(config_file, {'accounts': [{'token': "abc", 'channels': ["1"]}]})
+    service = app.ConfigService(config_file)
+    notified = []
+    service.subscribe(notified.append)
+    valid = service.get()
+
+    os.remove(config_file)
+    service._watch_tick()
+    assert service.get() is valid
+    assert notified == []
+    assert not os.path.exists(config_file)
+
+    write_json(config_file, {'accounts': []})
+    service._watch_tick()
+    assert service.get()['accounts'] == []
+    assert len(notified) == 1
+
+
+# --- AI ---
+def test_response_cache_normalization():
+    key = app.ResponseCache.make_key
+    assert key(["GM!!  fam"]) == key(["gm fam"])
+    assert key(["gmmm"]) == key(["gmm"]) == key(["gmmmmmm"])
+    assert key(["gm"]) != key(["gmm"])
+    assert key(["1000 eth"]) != key(["10 eth"])
+    assert key(["a", "b"]) != key(["a b"])
+
+def test_response_cache_lru_and_ttl(monkeypatch):
+    cache = app.ResponseCache(max_size=2, ttl_seconds=10)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # "b" paling lama tidak dipakai
+    assert cache.get("b") is None
+    now = time.monotonic() + 11
+    monkeypatch.setattr(app.time, 'monotonic', lambda: now)
+    assert cache.get("a") is None
+
+def test_stub_backend():
+    backend = app.StubGeminiBackend(reply="wagmi")
+    previous = app.gemini_backend
+    app.set_gemini_backend(backend)
+    try:
+        assert app.generate_gemini_response("test-key", "gm") == "wagmi"
+        assert app.generate_gemini_response("test-key", "gn") == "wagmi"
+    finally:
+        app.set_gemini_backend(previous)
+    assert backend.calls == 2
+
+
+# --- Scheduler ---
+def test_scheduler_repeats_until_none():
+    scheduler = app.Scheduler(max_workers=2)
+    runs, done = [], threading.Event()
+
+    def tick():
+        runs.append(scheduler.on_worker_thread())
+        if len(runs) == 3:
+            done.set()
+            return None
+        return 0.01
+
+    scheduler.schedule(0, tick)
+    assert done.wait(5)
+    time.sleep(0.05)
+    assert runs == [True, True, True]
+    assert scheduler.pending_count() == 0
+    assert not scheduler.on_worker_thread()
+
+def test_scheduler_cancel():
+    scheduler = app.Scheduler(max_workers=1)
+    runs = []
+    job = scheduler.schedule(0.05, lambda: runs.append(1))
+    scheduler.cancel(job)
+    time.sleep(0.15)
+    assert runs == []
+    assert scheduler.pending_count() == 0